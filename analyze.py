@@ -1,6 +1,6 @@
 """Analyze Flow - load pcap and reconstruct messages."""
 
-import os, glob
+import os
 from rich.prompt  import Prompt
 from rich.panel   import Panel
 from rich.table   import Table
@@ -8,49 +8,54 @@ from rich.padding import Padding
 from rich         import box
 from rich.text    import Text
 
+from ui.keys import wait_key
+
 
 class AnalyzeFlow:
+    BANNER = Panel(
+        "[bold green]🔍  ANALYZE MODULE[/bold green]\n"
+        "[dim]Parse a saved .pcap and reconstruct human-readable messages[/dim]",
+        border_style="green", padding=(1, 4)
+    )
+
     def __init__(self, console):
-        self.console = console
+        self.console      = console
+        self._pcap_future = None
 
     def _pick_pcap(self):
         c = self.console
-        # Scan common output dirs for pcap files
-        default_dir = os.path.expanduser("~/netcapture_output")
-        pcaps = sorted(glob.glob(f"{default_dir}/**/*.pcap", recursive=True), reverse=True)
+        # Recent pcaps - scanned in the background since run() started
+        pcaps = self._pcap_future.result()
 
         if pcaps:
+            from core.outputs import fmt_bytes
             c.print("\n[bold cyan]  Recent captures:[/bold cyan]\n")
             tbl = Table(box=box.MINIMAL, show_header=False, padding=(0,2))
             tbl.add_column("#", width=4, style="cyan")
             tbl.add_column("File", style="white")
             tbl.add_column("Size", style="dim", width=12)
-            for i, p in enumerate(pcaps[:10], 1):
-                size = os.path.getsize(p)
-                sz   = f"{size//1024} KB" if size >= 1024 else f"{size} B"
-                tbl.add_row(str(i), p, sz)
+            for i, (p, size, _) in enumerate(pcaps, 1):
+                tbl.add_row(str(i), p, fmt_bytes(size))
             c.print(tbl)
             c.print()
             sel = Prompt.ask("[cyan]  Select # or enter path[/cyan]").strip()
             if sel.isdigit() and 1 <= int(sel) <= len(pcaps):
-                return pcaps[int(sel)-1]
+                return pcaps[int(sel)-1][0]
             return sel
         else:
             return Prompt.ask("[cyan]  Enter .pcap file path[/cyan]").strip()
 
     def run(self):
         c = self.console
+        from core.outputs import scan_outputs_async
+        self._pcap_future = scan_outputs_async(limit=10)
         c.clear()
-        c.print(Panel(
-            "[bold green]🔍  ANALYZE MODULE[/bold green]\n"
-            "[dim]Parse a saved .pcap and reconstruct human-readable messages[/dim]",
-            border_style="green", padding=(1, 4)
-        ))
+        c.print(self.BANNER)
 
         pcap_path = self._pick_pcap()
         if not pcap_path or not os.path.exists(pcap_path):
             c.print(f"[red]  File not found: {pcap_path}[/red]")
-            input("  Press Enter...")
+            wait_key("  Press any key...")
             return
 
         c.print(f"\n  [green]✓[/green] Loading: [cyan]{pcap_path}[/cyan]")
@@ -59,15 +64,14 @@ class AnalyzeFlow:
         meta_path = pcap_path.replace(".pcap","_meta.json")
         meta = {}
         if os.path.exists(meta_path):
-            import json
-            with open(meta_path) as f:
-                meta = json.load(f)
+            from core.jsonio import load_json
+            meta = load_json(meta_path)
             c.print(f"  [green]✓[/green] Metadata loaded")
 
         # Reconstruct
         with c.status("[green]  Reconstructing messages...[/green]", spinner="dots12"):
-            from core.reconstructor import reconstruct
-            messages = reconstruct(pcap_path)
+            from core.reconstructor import reconstruct_parallel
+            messages = reconstruct_parallel(pcap_path)
 
         # Show summary
         c.print(f"\n  [bold green]Reconstruction complete:[/bold green]\n")
@@ -104,15 +108,10 @@ class AnalyzeFlow:
             c.print(f"  [green]✓[/green] Text Report → [cyan]{txt_path}[/cyan]")
 
         # Save raw messages JSON
-        import json
+        from core.jsonio import dump_json_stream
         msg_path = os.path.join(out_dir, f"{base}_messages.json")
-        serializable = {
-            k: [{kk: list(vv) if isinstance(vv, set) else vv for kk, vv in m.items()} for m in v]
-            for k, v in messages.items()
-        }
-        with open(msg_path, "w") as f:
-            json.dump(serializable, f, indent=2)
+        dump_json_stream(msg_path, messages)
         c.print(f"  [green]✓[/green] Raw JSON   → [cyan]{msg_path}[/cyan]")
 
-        c.print("\n  [dim]Press Enter to return to menu...[/dim]")
-        input()
+        c.print("\n  [dim]Press any key to return to menu...[/dim]")
+        wait_key()
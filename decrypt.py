@@ -1,12 +1,14 @@
 """Decrypt Flow UI - TLS key log, WPA2, payload decoder."""
 
-import os, glob
+import os
 from rich.prompt  import Prompt, Confirm
 from rich.panel   import Panel
 from rich.table   import Table
 from rich.text    import Text
 from rich         import box
 
+from ui.keys import wait_key
+
 
 DECRYPT_METHODS = [
     ("1", "tls_keylog",  "🔐 TLS via SSLKEYLOGFILE", "Decrypt HTTPS using browser/app key log file"),
@@ -19,12 +21,26 @@ DECRYPT_METHODS = [
 
 
 class DecryptFlow:
+    BANNER = Panel(
+        "[bold yellow]🔓  DECRYPT MODULE[/bold yellow]\n"
+        "[dim]TLS decryption, Wi-Fi decryption, payload decoding[/dim]",
+        border_style="yellow", padding=(1, 4)
+    )
+
     def __init__(self, console):
-        self.console = console
+        self.console      = console
+        self._pcap_future = None
+        self._bundle      = (None, None)    # ((path, mtime_ns, size), certs/RTSP bundle)
+        # The method menu never changes; build it once, reprint every loop
+        self._menu_table = Table(box=box.ROUNDED, border_style="yellow", show_header=False, padding=(0,3))
+        self._menu_table.add_column("Key",    style="bold yellow", width=4)
+        self._menu_table.add_column("Method", style="bold white",  width=28)
+        self._menu_table.add_column("Desc",   style="dim",         width=50)
+        for key, _, label, desc in DECRYPT_METHODS:
+            self._menu_table.add_row(key, label, desc)
 
     def _pick_pcap(self, prompt="  .pcap file path"):
-        default_dir = os.path.expanduser("~/netcapture_output")
-        pcaps = sorted(glob.glob(f"{default_dir}/**/*.pcap", recursive=True), reverse=True)[:8]
+        pcaps = [p for p, _, _ in self._pcap_future.result()]
         if pcaps:
             self.console.print("\n[bold yellow]  Recent captures:[/bold yellow]")
             for i, p in enumerate(pcaps, 1):
@@ -36,23 +52,28 @@ class DecryptFlow:
             return sel
         return Prompt.ask(f"[yellow]{prompt}[/yellow]").strip()
 
+    def _analyze(self, pcap, status):
+        """
+        Certificates + RTSP streams for `pcap` from one analyze_pcap_bundle
+        pass, reused by both menu options until the file changes.
+        """
+        st  = os.stat(pcap)
+        key = (pcap, st.st_mtime_ns, st.st_size)
+        if self._bundle[0] != key:
+            with self.console.status(f"[yellow]  {status}[/yellow]", spinner="dots"):
+                from core.decryptor import analyze_pcap_bundle
+                self._bundle = (key, analyze_pcap_bundle(pcap))
+        return self._bundle[1]
+
     def run(self):
         c = self.console
+        from core.outputs import scan_outputs_async
         while True:
+            # Rescan each pass (a method may have written new files) while the menu draws
+            self._pcap_future = scan_outputs_async(limit=8)
             c.clear()
-            c.print(Panel(
-                "[bold yellow]🔓  DECRYPT MODULE[/bold yellow]\n"
-                "[dim]TLS decryption, Wi-Fi decryption, payload decoding[/dim]",
-                border_style="yellow", padding=(1, 4)
-            ))
-
-            tbl = Table(box=box.ROUNDED, border_style="yellow", show_header=False, padding=(0,3))
-            tbl.add_column("Key",    style="bold yellow", width=4)
-            tbl.add_column("Method", style="bold white",  width=28)
-            tbl.add_column("Desc",   style="dim",         width=50)
-            for key, _, label, desc in DECRYPT_METHODS:
-                tbl.add_row(key, label, desc)
-            c.print(tbl)
+            c.print(self.BANNER)
+            c.print(self._menu_table)
             c.print()
 
             choice = Prompt.ask("[yellow]  Select method[/yellow]",
@@ -64,7 +85,7 @@ class DecryptFlow:
             elif choice == "1":   # TLS keylog
                 pcap = self._pick_pcap()
                 if not os.path.exists(pcap):
-                    c.print(f"[red]  File not found: {pcap}[/red]"); input("  Enter..."); continue
+                    c.print(f"[red]  File not found: {pcap}[/red]"); wait_key("  Press any key..."); continue
                 c.print("\n[dim]  The SSLKEYLOGFILE is set in your browser/app environment.[/dim]")
                 c.print("[dim]  Chrome/Firefox: set env var SSLKEYLOGFILE=~/ssl_keys.log before launch.[/dim]\n")
                 keylog = Prompt.ask("[yellow]  Path to SSLKEYLOGFILE[/yellow]",
@@ -85,7 +106,7 @@ class DecryptFlow:
             elif choice == "2":   # WPA2
                 pcap = self._pick_pcap()
                 if not os.path.exists(pcap):
-                    c.print(f"[red]  File not found: {pcap}[/red]"); input("  Enter..."); continue
+                    c.print(f"[red]  File not found: {pcap}[/red]"); wait_key("  Press any key..."); continue
                 ssid = Prompt.ask("[yellow]  Wi-Fi SSID[/yellow]")
                 psk  = Prompt.ask("[yellow]  Wi-Fi Passphrase[/yellow]", password=True)
                 out_dir = os.path.dirname(pcap)
@@ -110,7 +131,7 @@ class DecryptFlow:
                     if not line:
                         break
                     lines.append(line)
-                raw = "\n".join(lines)
+                raw = "\n".join(lines).encode()
                 if raw:
                     from core.decryptor import decode_payload
                     results = decode_payload(raw)
@@ -122,10 +143,8 @@ class DecryptFlow:
             elif choice == "4":   # TLS certs
                 pcap = self._pick_pcap()
                 if not os.path.exists(pcap):
-                    c.print(f"[red]  File not found: {pcap}[/red]"); input("  Enter..."); continue
-                with c.status("[yellow]  Extracting certificates...[/yellow]", spinner="dots"):
-                    from core.decryptor import extract_certificates
-                    certs = extract_certificates(pcap, os.path.dirname(pcap))
+                    c.print(f"[red]  File not found: {pcap}[/red]"); wait_key("  Press any key..."); continue
+                certs = self._analyze(pcap, "Extracting certificates...")["certs"]
                 if certs:
                     tbl2 = Table(box=box.ROUNDED, border_style="yellow", header_style="bold yellow")
                     tbl2.add_column("Time",   style="dim",    width=22)
@@ -144,15 +163,13 @@ class DecryptFlow:
             elif choice == "5":   # RTSP
                 pcap = self._pick_pcap()
                 if not os.path.exists(pcap):
-                    c.print(f"[red]  File not found: {pcap}[/red]"); input("  Enter..."); continue
-                with c.status("[yellow]  Extracting RTSP streams...[/yellow]", spinner="dots"):
-                    from core.decryptor import extract_rtsp
-                    streams = extract_rtsp(pcap)
+                    c.print(f"[red]  File not found: {pcap}[/red]"); wait_key("  Press any key..."); continue
+                streams = self._analyze(pcap, "Extracting RTSP streams...")["rtsp"]
                 if streams:
                     for s in streams:
                         c.print(f"  [cyan]{s['method']}[/cyan]  [white]{s['url']}[/white]  [dim]{s['time'][:20]}[/dim]")
                 else:
                     c.print("  [yellow]No RTSP streams found.[/yellow]")
 
-            c.print("\n  [dim]Press Enter to continue...[/dim]")
-            input()
+            c.print("\n  [dim]Press any key to continue...[/dim]")
+            wait_key()
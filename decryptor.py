@@ -7,9 +7,131 @@ Decryption Engine
 - Attempt common protocol decryption (SIP, RTSP)
 """
 
-import os, re, json, base64, subprocess, tempfile, binascii
+import os, re, json, subprocess, tempfile, binascii, threading, mmap, struct, string
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import unquote_plus
 from datetime import datetime
+from itertools import islice
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# ── tshark helpers ───────────────────────────────────────
+
+TSHARK_MISSING = "tshark not found. Install: sudo apt install tshark"
+
+# -T fields columns per use; frame.protocols leads so one pass can be demuxed
+HTTP_FIELDS  = ("frame.time", "ip.src", "ip.dst", "http.request.uri",
+                "http.request.method", "http2.headers.path", "data-text-lines")
+CERT_FIELDS  = ("frame.time", "ip.src", "ip.dst", "x509sat.uTF8String", "x509ce.dNSName")
+RTSP_FIELDS  = ("frame.time", "rtsp.url", "rtsp.method")
+_HTTP_PROTOS = frozenset(("http", "http2", "data-text-lines"))
+
+
+def _fields(names) -> list:
+    return [arg for n in names for arg in ("-e", n)]
+
+
+class _TsharkRun:
+    """
+    One tshark process; iterating yields its -T fields rows (split on tabs)
+    as they are printed, so output is never buffered whole. Exiting the
+    `with` reaps the process and raises TimeoutExpired if it was killed
+    for running past `timeout`.
+    """
+    def __init__(self, args: list, timeout: int):
+        self.timeout   = timeout
+        self.timed_out = False
+        self.proc      = subprocess.Popen(["tshark", *args], stdout=subprocess.PIPE,
+                                          stderr=subprocess.DEVNULL, text=True, bufsize=1)
+        self._timer    = threading.Timer(timeout, self._kill)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _kill(self):
+        self.timed_out = True
+        self.proc.kill()
+
+    def __iter__(self):
+        for line in self.proc.stdout:
+            yield line.rstrip("\n").split("\t")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *_):
+        self._timer.cancel()
+        if exc_type is not None:
+            self.proc.kill()
+        self.proc.stdout.close()
+        self.proc.wait()
+        if self.timed_out and exc_type is None:
+            raise subprocess.TimeoutExpired(self.proc.args, self.timeout)
+
+    @property
+    def returncode(self):
+        return self.proc.returncode
+
+
+def _cert_row(parts):
+    if len(parts) >= 5 and any(parts[3:]):
+        return {"time": parts[0], "src": parts[1], "dst": parts[2],
+                "cn": parts[3], "san": parts[4] if len(parts) > 4 else ""}
+    return None
+
+
+def _rtsp_row(parts):
+    if len(parts) >= 2 and parts[1]:
+        return {"time": parts[0], "url": parts[1], "method": parts[2] if len(parts) > 2 else ""}
+    return None
+
+
+def analyze_pcap_bundle(pcap_path: str, timeout: int = 120) -> dict:
+    """
+    Certificates and RTSP URLs from a single tshark pass, demuxed by
+    frame.protocols. On classic pcaps the RTSP regex scan runs in a
+    worker thread alongside tshark instead. Returns {"certs": [...], "rtsp": [...]}.
+    """
+    fast_rtsp = _is_classic_pcap(pcap_path)
+    flt  = "tls.handshake.certificate" if fast_rtsp else "tls.handshake.certificate or rtsp"
+    cols = ("frame.protocols",) + CERT_FIELDS + RTSP_FIELDS[1:]
+    args = ["-r", pcap_path, "-Y", flt, "-T", "fields", *_fields(cols)]
+
+    out = {"certs": [], "rtsp": []}
+    with ThreadPoolExecutor(max_workers=1) as ex:
+        rtsp_job = ex.submit(_rtsp_scan, pcap_path) if fast_rtsp else None
+        try:
+            with _TsharkRun(args, timeout) as run:
+                for parts in run:
+                    cert = _cert_row(parts[1:6])
+                    if cert:
+                        out["certs"].append(cert)
+                    if "rtsp" in parts[0].split(":"):
+                        stream = _rtsp_row(parts[1:2] + parts[6:8])
+                        if stream:
+                            out["rtsp"].append(stream)
+        except Exception:
+            pass
+        if rtsp_job:
+            try:
+                out["rtsp"] = rtsp_job.result()
+            except Exception:
+                # The main pass skipped rtsp frames; recover them with tshark
+                out["rtsp"] = _tshark_rtsp(pcap_path, timeout)
+    return out
+
+
+def _tshark_rtsp(pcap_path: str, timeout: int) -> list:
+    args = ["-r", pcap_path, "-Y", "rtsp", "-T", "fields", *_fields(RTSP_FIELDS)]
+    try:
+        with _TsharkRun(args, timeout) as run:
+            return [s for s in map(_rtsp_row, run) if s]
+    except Exception:
+        return []
 
 
 # ── TLS/SSL via key log file ─────────────────────────────
@@ -24,24 +146,15 @@ def decrypt_tls_with_keylog(pcap_path: str, keylog_path: str, output_dir: str) -
     out_pcap = os.path.join(output_dir, f"decrypted_tls_{ts}.pcap")
     out_txt  = os.path.join(output_dir, f"decrypted_tls_{ts}.txt")
 
-    # tshark decrypt to pcap
-    cmd_pcap = [
-        "tshark", "-r", pcap_path,
-        "-o", f"tls.keylog_file:{keylog_path}",
-        "-w", out_pcap
-    ]
-    # tshark export HTTP/2 and HTTP objects
-    cmd_txt = [
-        "tshark", "-r", pcap_path,
+    # One tshark pass: -w writes the pcap, -P still prints the HTTP/HTTP2
+    # fields. No -Y (it would filter the written pcap too) - frames are
+    # matched on frame.protocols here instead.
+    args = [
+        "-r", pcap_path,
         "-o", f"tls.keylog_file:{keylog_path}",
-        "-Y", "http or http2 or data-text-lines",
+        "-w", out_pcap, "-P",
         "-T", "fields",
-        "-e", "frame.time",
-        "-e", "ip.src", "-e", "ip.dst",
-        "-e", "http.request.uri",
-        "-e", "http.request.method",
-        "-e", "http2.headers.path",
-        "-e", "data-text-lines",
+        *_fields(("frame.protocols",) + HTTP_FIELDS),
     ]
 
     results = {
@@ -53,22 +166,24 @@ def decrypt_tls_with_keylog(pcap_path: str, keylog_path: str, output_dir: str) -
     }
 
     try:
-        r = subprocess.run(cmd_pcap, capture_output=True, timeout=60)
-        if r.returncode == 0 and os.path.exists(out_pcap):
+        records = results["records"]
+        with _TsharkRun(args, timeout=120) as run, open(out_txt, "w") as f:
+            f.write("=== TLS Decrypted Traffic ===\n\n")
+            for r in run:
+                if not _HTTP_PROTOS & set(r[0].split(":")):
+                    continue
+                line = "\t".join(r[1:])
+                if line.strip():
+                    f.write(line + "\n")
+                    if len(records) < 200:
+                        records.append(line)
+        if run.returncode == 0 and os.path.exists(out_pcap):
             results["success"] = True
             results["message"] = f"Decrypted pcap saved: {out_pcap}"
-
-        r2 = subprocess.run(cmd_txt, capture_output=True, text=True, timeout=60)
-        lines = [l for l in r2.stdout.splitlines() if l.strip()]
-        with open(out_txt, "w") as f:
-            f.write("=== TLS Decrypted Traffic ===\n\n")
-            for line in lines:
-                f.write(line + "\n")
-        results["records"] = lines[:200]
-        if not results["message"]:
+        else:
             results["message"] = f"Decrypted text saved: {out_txt}"
     except FileNotFoundError:
-        results["message"] = "tshark not found. Install: sudo apt install tshark"
+        results["message"] = TSHARK_MISSING
     except subprocess.TimeoutExpired:
         results["message"] = "Decryption timed out."
     except Exception as e:
@@ -87,123 +202,170 @@ def decrypt_wifi_wpa2(pcap_path: str, psk: str, ssid: str, output_dir: str) -> d
 
     # tshark wpa decryption key format: wpa-pwd:PSK:SSID
     key = f"wpa-pwd:{psk}:{ssid}"
-    cmd = [
-        "tshark", "-r", pcap_path,
+    args = [
+        "-r", pcap_path,
         "-o", f"wlan.enable_decryption:TRUE",
         "-o", f"uat:80211_keys:\"wpa-pwd\",\"{psk}:{ssid}\"",
         "-Y", "http or data",
         "-T", "fields",
-        "-e", "frame.time", "-e", "ip.src", "-e", "ip.dst",
-        "-e", "http.host", "-e", "http.request.uri",
+        *_fields(("frame.time", "ip.src", "ip.dst", "http.host", "http.request.uri")),
     ]
+    header = (f"=== WPA2-PSK Decrypted Wi-Fi Traffic ===\n"
+              f"SSID: {ssid}  |  PSK: {'*' * len(psk)}\n\n")
     try:
-        r = subprocess.run(cmd, capture_output=True, text=True, timeout=120)
-        lines = [l for l in r.stdout.splitlines() if l.strip()]
+        # Nothing to demux here, so tshark writes the rows to the file itself
         with open(out_txt, "w") as f:
-            f.write(f"=== WPA2-PSK Decrypted Wi-Fi Traffic ===\n")
-            f.write(f"SSID: {ssid}  |  PSK: {'*' * len(psk)}\n\n")
-            for line in lines:
-                f.write(line + "\n")
-        return {"success": True, "output": out_txt, "records": lines[:200]}
-    except FileNotFoundError:
-        return {"success": False, "message": "tshark not found. Install: sudo apt install tshark"}
+            f.write(header)
+            f.flush()
+            proc = subprocess.run(["tshark", *args], stdout=f, stderr=subprocess.DEVNULL, timeout=120)
+        if proc.returncode != 0:
+            raise RuntimeError(f"tshark exited with status {proc.returncode}")
+        # Preview: the first 200 rows, read back from the file
+        with open(out_txt) as f:
+            rows    = islice(f, header.count("\n"), None)
+            records = list(islice((l.rstrip("\n") for l in rows if l.strip()), 200))
+        return {"success": True, "output": out_txt, "records": records}
     except Exception as e:
+        # No header-only / partial output left behind for later scans
+        try:
+            os.unlink(out_txt)
+        except OSError:
+            pass
+        if isinstance(e, FileNotFoundError) and e.filename == "tshark":
+            return {"success": False, "message": TSHARK_MISSING}
+        if isinstance(e, subprocess.TimeoutExpired):
+            return {"success": False, "message": "Decryption timed out."}
         return {"success": False, "message": str(e)}
 
 
 # ── Payload decoder ──────────────────────────────────────
 
-def decode_payload(raw: str) -> dict:
-    """Attempt to decode a raw payload string via multiple methods."""
-    results = {}
+# Compiled once; base64 needs no whitespace pattern (a2b_base64 skips it)
+_HEX_RE = re.compile(rb"[0-9a-fA-F]+")
+# ASCII control bytes - any of these decodes to a non-printable char
+_CTRL_BYTES = bytes(range(32)) + b"\x7f"
+# Bytes a pasted base64 blob may contain (alphabet, padding, line breaks)
+_B64_BYTES  = (string.ascii_letters + string.digits + "+/=" + string.whitespace).encode()
+# First non-blank byte of any JSON document
+_JSON_START = frozenset(b'{["-0123456789tfnNI')
 
-    # Base64
-    try:
-        stripped = re.sub(r"\s", "", raw)
-        decoded  = base64.b64decode(stripped + "==").decode("utf-8", errors="replace")
-        if len(decoded) > 4 and decoded.isprintable():
-            results["base64"] = decoded[:2000]
-    except Exception:
-        pass
+# Each decoder takes (data, mv, text) and returns the decoded text, or
+# None when a cheap prefilter (translate / membership test) rules it out -
+# garbage input is rejected without raising inside the decoder.
 
-    # URL-encoded
-    try:
-        decoded = unquote_plus(raw)
-        if decoded != raw:
-            results["url_decoded"] = decoded[:2000]
-    except Exception:
-        pass
+def _decode_base64(data, mv, text):
+    # Only pure base64 text; a2b_base64 skips the whitespace
+    if data.translate(None, _B64_BYTES):
+        return None
+    raw_b = binascii.a2b_base64(data + b"==")
+    # Binary garbage (the usual case) shows control bytes early; reject
+    # it from a 64-byte probe before decoding everything
+    head = raw_b[:64]
+    if len(head.translate(None, _CTRL_BYTES)) != len(head):
+        return None
+    decoded = raw_b.decode("utf-8", errors="replace")
+    return decoded if len(decoded) > 4 and decoded.isprintable() else None
 
-    # Hex
-    try:
-        stripped = raw.replace(" ","").replace(":","")
-        if re.fullmatch(r"[0-9a-fA-F]+", stripped) and len(stripped) % 2 == 0:
-            decoded = bytes.fromhex(stripped).decode("utf-8", errors="replace")
-            results["hex_decoded"] = decoded[:2000]
-    except Exception:
-        pass
 
-    # JSON pretty-print
-    try:
-        jdata = json.loads(raw)
-        results["json"] = json.dumps(jdata, indent=2)[:2000]
-    except Exception:
-        pass
+def _decode_url(data, mv, text):
+    # unquote_plus only changes text containing % or +
+    if b"%" not in data and b"+" not in data:
+        return None
+    decoded = unquote_plus(text)
+    return decoded if decoded != text else None
+
+
+def _decode_hex(data, mv, text):
+    stripped = data.translate(None, b" :")
+    if len(stripped) % 2 or not _HEX_RE.fullmatch(stripped):
+        return None
+    return binascii.unhexlify(stripped).decode("utf-8", errors="replace")
+
+
+def _decode_json(data, mv, text):
+    head = data.lstrip()[:1]
+    if not head or head[0] not in _JSON_START:
+        return None
+    return json.dumps(orjson.loads(mv) if orjson else json.loads(data), indent=2)
+
+
+# Result key -> decoder, tried in this order
+_DECODERS = (
+    ("base64",      _decode_base64),
+    ("url_decoded", _decode_url),
+    ("hex_decoded", _decode_hex),
+    ("json",        _decode_json),
+)
+
+
+def decode_payload(raw) -> dict:
+    """
+    Attempt to decode a raw payload via multiple methods. Accepts bytes
+    (or str); every decoder reads the same buffer through one memoryview.
+    """
+    data = raw.encode() if isinstance(raw, str) else bytes(raw)
+    mv   = memoryview(data)
+    text = raw if isinstance(raw, str) else data.decode("utf-8", errors="replace")
+    results = {}
+    for name, decoder in _DECODERS:
+        try:
+            decoded = decoder(data, mv, text)
+        except Exception:
+            continue
+        if decoded is not None:
+            results[name] = decoded[:2000]
 
     if not results:
-        results["raw"] = raw[:2000]
+        results["raw"] = text[:2000]
 
     return results
 
 
-# ── TLS Certificate extraction ───────────────────────────
+# ── RTSP stream URL extraction ───────────────────────────
 
-def extract_certificates(pcap_path: str, output_dir: str) -> list:
-    """Extract TLS certificates from a pcap using tshark."""
-    os.makedirs(output_dir, exist_ok=True)
-    cmd = [
-        "tshark", "-r", pcap_path,
-        "-Y", "tls.handshake.certificate",
-        "-T", "fields",
-        "-e", "frame.time",
-        "-e", "ip.src", "-e", "ip.dst",
-        "-e", "x509sat.uTF8String",
-        "-e", "x509ce.dNSName",
-    ]
-    certs = []
+# RTSP request line: METHOD rtsp://host/path RTSP/1.0
+_RTSP_RE = re.compile(rb"\b(OPTIONS|DESCRIBE|ANNOUNCE|SETUP|PLAY|PAUSE|RECORD|TEARDOWN"
+                      rb"|GET_PARAMETER|SET_PARAMETER|REDIRECT) (rtsps?://[^\s]+) RTSP/\d\.\d")
+
+
+def _is_classic_pcap(path: str) -> bool:
+    from core.reconstructor import pcap_layout, PCAP_HDR_LEN
     try:
-        r = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-        for line in r.stdout.splitlines():
-            parts = line.split("\t")
-            if len(parts) >= 5 and any(parts[3:]):
-                certs.append({
-                    "time": parts[0],
-                    "src":  parts[1],
-                    "dst":  parts[2],
-                    "cn":   parts[3],
-                    "san":  parts[4] if len(parts) > 4 else "",
-                })
-    except Exception:
-        pass
-    return certs
+        with open(path, "rb") as f:
+            pcap_layout(f.read(PCAP_HDR_LEN))
+        return True
+    except (OSError, ValueError, struct.error):
+        return False
 
 
-# ── RTSP stream URL extraction ───────────────────────────
+def _rtsp_scan(pcap_path: str) -> list:
+    """
+    tshark-free RTSP scan: one regex pass over the mmapped capture, each
+    hit mapped back to its pcap record for the timestamp. Raises
+    ValueError for anything but an uncompressed classic pcap.
+    """
+    from core.reconstructor import pcap_layout, PCAP_HDR_LEN, PCAP_REC_LEN
+    with open(pcap_path, "rb") as f, \
+         mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        rec, divisor, _ = pcap_layout(mm)
+        hits = [(m.start(), m.group(1), m.group(2)) for m in _RTSP_RE.finditer(mm)]
+        if not hits:
+            return []
+        starts, times = [], []
+        off, size = PCAP_HDR_LEN, len(mm)
+        while off + PCAP_REC_LEN <= size:
+            sec, frac, incl, _ = rec.unpack_from(mm, off)
+            starts.append(off)
+            times.append(sec + frac / divisor)
+            off += PCAP_REC_LEN + incl
 
-def extract_rtsp(pcap_path: str) -> list:
-    cmd = [
-        "tshark", "-r", pcap_path,
-        "-Y", "rtsp",
-        "-T", "fields",
-        "-e", "frame.time", "-e", "rtsp.url", "-e", "rtsp.method",
-    ]
     streams = []
-    try:
-        r = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-        for line in r.stdout.splitlines():
-            parts = line.split("\t")
-            if len(parts) >= 2 and parts[1]:
-                streams.append({"time": parts[0], "url": parts[1], "method": parts[2] if len(parts)>2 else ""})
-    except Exception:
-        pass
+    for pos, method, url in hits:
+        i  = bisect_right(starts, pos) - 1
+        ts = datetime.fromtimestamp(times[i]) if i >= 0 else None
+        streams.append({
+            "time":   ts.strftime("%b %d, %Y %H:%M:%S.%f") if ts else "",
+            "url":    url.decode("latin-1"),
+            "method": method.decode(),
+        })
     return streams
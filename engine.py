@@ -1,14 +1,25 @@
 """Core traffic capture & device discovery engine."""
 
-import os, time, json, threading
-from datetime import datetime
-from collections import defaultdict
+import os, re, time, threading, socket, struct, mmap, select, tempfile
+from array       import array
+from datetime    import datetime
+from functools   import lru_cache
+from itertools   import chain, islice
+from dataclasses import dataclass, field, replace
+
+from core.jsonio import dump_json
 
 from scapy.all import (
-    sniff, wrpcap, ARP, IP, TCP, UDP, DNS, DNSQR, Ether,
+    AsyncSniffer, PcapWriter, ARP, IP, TCP, UDP, DNS, DNSQR, Ether,
     get_if_list, conf
 )
 
+try:
+    import dpkt
+    DPKT = True
+except ImportError:
+    DPKT = False
+
 # ── Traffic signatures ──────────────────────────────────
 SIGNATURES = {
     "Social Media": {
@@ -62,14 +73,21 @@ except Exception:
 
 def mac_vendor(mac):
     if _mac_parser and mac:
-        try:
-            v = _mac_parser.get_manuf(mac)
-            return v or "Unknown"
-        except Exception:
-            pass
+        return _vendor_for(mac.upper())
     return "Unknown"
 
 
+@lru_cache(maxsize=4096)
+def _vendor_for(mac):
+    # Keyed on the whole address, not just the OUI: manuf also has
+    # /28 and /36 assignments inside registry OUIs (e.g. 70:B3:D5)
+    try:
+        return _mac_parser.get_manuf(mac) or "Unknown"
+    except Exception:
+        return "Unknown"
+
+
+@lru_cache(maxsize=512)
 def guess_os(ttl):
     if ttl is None:
         return "Unknown"
@@ -82,42 +100,359 @@ def guess_os(ttl):
     return f"Unknown (TTL={ttl})"
 
 
+# Lookup tables built once from SIGNATURES: port -> cat, and one regex over
+# every signature domain matching whole-label suffixes (so "x.com" matches
+# "api.x.com" but not "netflix.com"). Earlier SIGNATURES entries win ties.
+# DNS/SNI names stay bytes on the capture path, so the regex is bytes too.
+_CAT_RANK   = {cat: i for i, cat in enumerate(SIGNATURES)}
+_PORT2CAT   = {}
+_DOMAIN2CAT = {}
+for _cat, _sig in SIGNATURES.items():
+    for _p in _sig["ports"]:
+        _PORT2CAT.setdefault(_p, _cat)
+    for _d in _sig["domains"]:
+        _DOMAIN2CAT.setdefault(_d.encode(), _cat)
+_DOMAIN_RE = re.compile(rb"(?:^|\.)(" + b"|".join(
+    map(re.escape, sorted(_DOMAIN2CAT, key=len, reverse=True))) + rb")$")
+del _cat, _sig, _p, _d
+
+
+def domain_str(name: bytes) -> str:
+    """A captured DNS/SNI name (kept as raw bytes) as display text."""
+    return name.decode("ascii", "replace")
+
+
+def classify(ports, domains):
+    """Map observed L4 ports and DNS/SNI names (bytes) to a SIGNATURES category."""
+    hits = [_PORT2CAT[p] for p in _PORT2CAT.keys() & ports]
+    for qd in domains:
+        m = _DOMAIN_RE.search(qd)
+        if m:
+            hits.append(_DOMAIN2CAT[m.group(1)])
+    if not hits:
+        return "Other"
+    return min(hits, key=_CAT_RANK.__getitem__)
+
+
 def classify_packet(pkt):
     ports, domains = set(), set()
-    if IP not in pkt:
+    if pkt.getlayer(IP) is None:
         return "Other", domains
-    if TCP in pkt:
-        ports |= {pkt[TCP].dport, pkt[TCP].sport}
-    if UDP in pkt:
-        ports |= {pkt[UDP].dport, pkt[UDP].sport}
-    if DNS in pkt and pkt[DNS].qr == 0:
+    tcp, udp, dns = pkt.getlayer(TCP), pkt.getlayer(UDP), pkt.getlayer(DNS)
+    if tcp is not None:
+        ports |= {tcp.dport, tcp.sport}
+    if udp is not None:
+        ports |= {udp.dport, udp.sport}
+    if dns is not None and dns.qr == 0:
         try:
-            domains.add(pkt[DNSQR].qname.decode().rstrip("."))
+            domains.add(pkt.getlayer(DNSQR).qname.rstrip(b"."))
         except Exception:
             pass
-    for cat, sig in SIGNATURES.items():
-        if cat == "Other":
-            continue
-        for d in sig["domains"]:
-            for qd in domains:
-                if d in qd:
-                    return cat, domains
-        for p in sig["ports"]:
-            if p in ports:
-                return cat, domains
-    return "Other", domains
+    return classify(ports, domains), domains
+
+
+# ── Raw frame parsing (no scapy dissection) ─────────────
+DNS_PORTS = (53, 5353)
+
+
+def _dns_qname(msg):
+    """First question name of a DNS message as bytes, or None."""
+    if len(msg) < 12 or not (msg[4] or msg[5]):
+        return None
+    labels, off, n = [], 12, len(msg)
+    while off < n:
+        ln = msg[off]
+        if ln == 0:
+            return b".".join(labels)
+        if ln & 0xC0 or off + 1 + ln > n:
+            return None
+        labels.append(bytes(msg[off + 1:off + 1 + ln]))
+        off += 1 + ln
+    return None
+
+
+def _tls_sni(p):
+    """server_name (bytes) from a TLS ClientHello at the start of `p`, or None."""
+    try:
+        if p[0] != 0x16 or p[5] != 0x01:
+            return None
+        off  = 43                                          # record + handshake hdr + version + random
+        off += 1 + p[off]                                  # session id
+        off += 2 + int.from_bytes(p[off:off + 2], "big")   # cipher suites
+        off += 1 + p[off]                                  # compression methods
+        end  = min(off + 2 + int.from_bytes(p[off:off + 2], "big"), len(p))
+        off += 2
+        while off + 4 <= end:
+            etype = int.from_bytes(p[off:off + 2], "big")
+            elen  = int.from_bytes(p[off + 2:off + 4], "big")
+            off  += 4
+            if etype == 0:                                 # server_name: list len, type, name len, name
+                nlen = int.from_bytes(p[off + 3:off + 5], "big")
+                return bytes(p[off + 5:off + 5 + nlen]) or None
+            off += elen
+    except IndexError:
+        pass
+    return None
+
+
+def parse_frame(frame):
+    """
+    Read the fields CaptureEngine needs directly from an Ethernet/IPv4 frame
+    (bytes or memoryview) by offset. Returns None for anything else.
+    -> (src_mac, ttl, sport, dport, dns_qname, dns_is_query, tls_sni)
+    """
+    if len(frame) < 34 or frame[12] != 0x08 or frame[13] != 0x00:
+        return None
+    ihl  = (frame[14] & 0x0F) * 4
+    ttl  = frame[22]
+    mac  = bytes(frame[6:12]).hex(":")
+    l4   = 14 + ihl
+    frag = ((frame[20] & 0x1F) << 8) | frame[21]
+    if frame[23] not in (6, 17) or frag or len(frame) < l4 + 4:
+        return mac, ttl, None, None, None, False, None
+
+    sport, dport = struct.unpack_from("!HH", frame, l4)
+    qname, is_query, sni = None, False, None
+    if frame[23] == 6:
+        hlen    = (frame[l4 + 12] >> 4) * 4 if len(frame) > l4 + 12 else 0
+        payload = frame[l4 + hlen:] if hlen else b""
+        dns     = payload[2:] if 53 in (sport, dport) else None
+        if dns is None and payload[:1] == b"\x16":
+            sni = _tls_sni(payload)
+    else:
+        payload = frame[l4 + 8:]
+        dns     = payload if (sport in DNS_PORTS or dport in DNS_PORTS) else None
+    if dns is not None:
+        qname = _dns_qname(dns)
+        is_query = qname is not None and not dns[2] & 0x80
+    return mac, ttl, sport, dport, qname, is_query, sni
+
+
+def categorize(sport, dport, qname, is_query, sni):
+    """(category, names) for the L4/DNS/SNI fields returned by parse_frame."""
+    domains = set()
+    if qname and is_query:
+        domains.add(qname)
+    if sni:
+        domains.add(sni)
+    return classify({sport, dport} if dport is not None else (), domains), domains
+
+
+# ── AF_PACKET receive ring (Linux PACKET_MMAP, TPACKET_V3) ──
+SOL_PACKET       = 263
+PACKET_RX_RING   = 5
+PACKET_VERSION   = 10
+TPACKET_V3       = 2
+ETH_P_ALL        = 0x0003
+TP_STATUS_KERNEL = 0
+TP_STATUS_USER   = 1
+SO_ATTACH_FILTER = 26
+
+PROGRESS_INTERVAL = 0.25   # seconds between progress_cb calls (4 Hz)
+PCAP_SNAPLEN      = 65535  # same header snaplen wrpcap writes
+
+_BLOCK_HDR = struct.Struct("III")          # block_status, num_pkts, offset_to_first_pkt (at +8)
+_FRAME_HDR = struct.Struct("IIIIIIH")      # next_offset, sec, nsec, snaplen, len, status, mac
+_BPF_INSN  = struct.Struct("HBBI")         # code, jt, jf, k
+
+
+def bpf_ipv4_host(ip: str) -> bytes:
+    """
+    Classic BPF program for "ip host <ip>" on Ethernet frames (what
+    `tcpdump -dd ip host X` emits), so the kernel drops other traffic
+    before it reaches the ring.
+    """
+    addr = struct.unpack("!I", socket.inet_aton(ip))[0]
+    prog = (
+        (0x28, 0, 0, 12),         # ldh [12]            ethertype
+        (0x15, 0, 5, 0x0800),     # jeq #IPv4 ? : drop
+        (0x20, 0, 0, 26),         # ld  [26]            ip src
+        (0x15, 2, 0, addr),       # jeq #host ? accept
+        (0x20, 0, 0, 30),         # ld  [30]            ip dst
+        (0x15, 0, 1, addr),       # jeq #host ? accept : drop
+        (0x06, 0, 0, 0x40000),    # accept: ret #262144
+        (0x06, 0, 0, 0),          # drop:   ret #0
+    )
+    return b"".join(_BPF_INSN.pack(*insn) for insn in prog)
+
+
+def attach_bpf(sock, prog: bytes):
+    """SO_ATTACH_FILTER a classic BPF program (from bpf_ipv4_host) to `sock`."""
+    import ctypes
+    buf   = ctypes.create_string_buffer(prog, len(prog))
+    fprog = struct.pack("HP", len(prog) // _BPF_INSN.size, ctypes.addressof(buf))
+    sock.setsockopt(socket.SOL_SOCKET, SO_ATTACH_FILTER, fprog)
+
+
+class PacketRing:
+    """
+    Shared-memory receive ring on an AF_PACKET socket.
+    The kernel fills mmap'd blocks directly; frames are read in place with
+    no per-packet syscall or copy. Raises OSError where unsupported.
+    """
+
+    def __init__(self, iface: str, block_size: int = 1 << 20, block_nr: int = 16,
+                 frame_size: int = 1 << 11, retire_ms: int = 100, bpf: bytes = None):
+        self.block_size = block_size
+        self.block_nr   = block_nr
+        self.sock       = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
+        try:
+            if bpf:
+                attach_bpf(self.sock, bpf)
+            self.sock.setsockopt(SOL_PACKET, PACKET_VERSION, TPACKET_V3)
+            req = struct.pack("7I", block_size, block_nr, frame_size,
+                              block_size * block_nr // frame_size, retire_ms, 0, 0)
+            self.sock.setsockopt(SOL_PACKET, PACKET_RX_RING, req)
+            self.sock.bind((iface, ETH_P_ALL))
+            self.map = mmap.mmap(self.sock.fileno(), block_size * block_nr,
+                                 mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+        except Exception:
+            self.sock.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.map.close()
+        self.sock.close()
+
+    def frames(self, should_stop, poll_ms: int = 100):
+        """
+        Yield (timestamp, memoryview) per frame until should_stop() is true.
+        Views point into the ring and are only valid until the next item.
+        """
+        poller = select.poll()
+        poller.register(self.sock, select.POLLIN | select.POLLERR)
+        view = memoryview(self.map)
+        blk  = 0
+        try:
+            while not should_stop():
+                base = blk * self.block_size
+                status, num_pkts, off = _BLOCK_HDR.unpack_from(self.map, base + 8)
+                if not status & TP_STATUS_USER:
+                    poller.poll(poll_ms)
+                    continue
+                pos = base + off
+                for _ in range(num_pkts):
+                    nxt, sec, nsec, snaplen, _len, _st, mac = _FRAME_HDR.unpack_from(self.map, pos)
+                    frame = view[pos + mac:pos + mac + snaplen]
+                    try:
+                        yield sec + nsec / 1e9, frame
+                    finally:
+                        frame.release()
+                    pos += nxt
+                # Hand the block back to the kernel
+                struct.pack_into("I", self.map, base + 8, TP_STATUS_KERNEL)
+                blk = (blk + 1) % self.block_nr
+        finally:
+            view.release()
+
+
+# ── Per-category / per-device stats ─────────────────────
+@dataclass(slots=True)
+class TrafficStats:
+    count:   int = 0
+    bytes:   int = 0
+    ports:   set = field(default_factory=set)
+    domains: set = field(default_factory=set)
+
+
+@dataclass(slots=True)
+class DeviceProfile:
+    ip:         str
+    mac:        str = None
+    vendor:     str = "Unknown"
+    os_guess:   str = "Unknown"
+    ttl:        int = None
+    hostnames:  set = field(default_factory=set)
+    open_ports: set = field(default_factory=set)
+
+
+# ── Streaming pcap output ───────────────────────────────
+# Until open_writer() is called, at most SPOOL_PACKETS packets are held in
+# memory; older ones spill to an anonymous temp file as (ts, len, cat) + raw.
+SPOOL_PACKETS = 10_000
+_SPOOL_REC    = struct.Struct("<dIB")
+_CATS         = tuple(SIGNATURES)
+_CAT_INDEX    = {cat: i for i, cat in enumerate(_CATS)}
+
+
+def _new_spool():
+    # Append mode: writes land at the end even after a partial _spool_read
+    return tempfile.TemporaryFile(mode="a+b")
+
+
+def _spool_write(f, records):
+    """Append (ts, raw, cat) records to spool file `f`, SPOOL_PACKETS at a time."""
+    pack, idx = _SPOOL_REC.pack, _CAT_INDEX
+    records = iter(records)
+    while batch := [pack(ts, len(raw), idx[cat]) + raw for ts, raw, cat in islice(records, SPOOL_PACKETS)]:
+        f.writelines(batch)
+
+
+def _spool_read(f):
+    """Yield the (ts, raw, cat) records in spool file `f`, oldest first."""
+    f.flush()
+    f.seek(0)
+    size, unpack = _SPOOL_REC.size, _SPOOL_REC.unpack
+    while True:
+        hdr = f.read(size)
+        if len(hdr) < size:
+            break
+        ts, n, i = unpack(hdr)
+        yield ts, f.read(n), _CATS[i]
+
+
+class PcapSink:
+    """Append-only pcap file fed (ts, raw) records; dpkt writer, else scapy's."""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path  = path
+        self.count = 0
+        if DPKT:
+            self._w = dpkt.pcap.Writer(open(path, "wb"), snaplen=PCAP_SNAPLEN)
+        else:
+            self._w = PcapWriter(path, sync=False)
+
+    def write(self, ts, raw):
+        if DPKT:
+            self._w.writepkt(raw, ts=ts)
+        else:
+            pkt = Ether(raw)
+            pkt.time = ts
+            self._w.write(pkt)
+        self.count += 1
+
+    def close(self):
+        self._w.close()
 
 
 class CaptureEngine:
-    def __init__(self, target_ip: str, iface: str = None):
+    def __init__(self, target_ip: str, iface: str = None, pcap_path: str = None):
         self.target_ip    = target_ip
         self.iface        = iface or self._best_iface()
-        self.traffic      = defaultdict(lambda: {
-            "count": 0, "bytes": 0, "ports": set(), "domains": set()
-        })
+        self.traffic      = {cat: TrafficStats() for cat in SIGNATURES}
         self.devices      = {}
-        self.all_packets  = []
+        # Captured packets as parallel columns: timestamp, raw frame, category,
+        # behind an on-disk spool of anything older than SPOOL_PACKETS
+        self._ts          = array("d")
+        self._raw         = []
+        self._cat         = []
+        self._spool       = None
+        self._total_count = 0
+        self._total_bytes = 0
+        self._cat_filter  = None
+        self._sink        = None
+        self._sink_done   = None
+        self._store_lock  = threading.Lock()   # packet store + profile/stat sets vs. readers
         self._stop        = threading.Event()
+        if pcap_path:
+            self.open_writer(pcap_path)
 
     def _best_iface(self):
         for i in get_if_list():
@@ -138,111 +473,247 @@ class CaptureEngine:
             pass
         return None
 
+    def set_category_filter(self, cats):
+        """
+        Keep only packets in `cats` from now on (None keeps everything) and
+        drop already-stored packets outside it. Traffic stats still count
+        every category.
+        """
+        self._cat_filter = frozenset(cats) if cats else None
+        if self._cat_filter is None:
+            return
+        with self._store_lock:
+            keep = [c in self._cat_filter for c in self._cat]
+            self._ts  = array("d", (t for t, k in zip(self._ts, keep) if k))
+            self._raw = [r for r, k in zip(self._raw, keep) if k]
+            self._cat = [c for c, k in zip(self._cat, keep) if k]
+            if self._spool:
+                old, self._spool = self._spool, _new_spool()
+                _spool_write(self._spool, (r for r in _spool_read(old) if r[2] in self._cat_filter))
+                old.close()
+
+    def open_writer(self, path: str):
+        """
+        Stream packets to `path` from now on instead of holding them in
+        memory. Packets stored so far are written first; sniff() closes the
+        file when it returns.
+        """
+        with self._store_lock:
+            sink = PcapSink(path)
+            for ts, raw, _ in self._stored():
+                sink.write(ts, raw)
+            self._ts, self._raw, self._cat = array("d"), [], []
+            self._drop_spool()
+            self._sink, self._sink_done = sink, None
+
+    def _stored(self):
+        """(ts, raw, cat) for every stored packet, spooled ones first. Hold _store_lock."""
+        if self._spool:
+            yield from _spool_read(self._spool)
+        yield from zip(self._ts, self._raw, self._cat)
+
+    def _spill(self):
+        """Move the in-memory columns to the spool file. Hold _store_lock."""
+        if self._spool is None:
+            self._spool = _new_spool()
+        _spool_write(self._spool, zip(self._ts, self._raw, self._cat))
+        self._ts, self._raw, self._cat = array("d"), [], []
+
+    def _drop_spool(self):
+        if self._spool:
+            self._spool.close()
+            self._spool = None
+
+    def _close_writer(self):
+        with self._store_lock:
+            if self._sink:
+                self._sink.close()
+                self._sink, self._sink_done = None, self._sink
+
+    def _account(self, ts, raw, mac, ttl, sport, dport, qname, is_query, sni):
+        """Update device profile + traffic stats for one packet to/from the target."""
+        self._total_count += 1
+        self._total_bytes += len(raw)
+        cat, domains = categorize(sport, dport, qname, is_query, sni)
+        keep = self._cat_filter is None or cat in self._cat_filter
+
+        # Sets are only mutated under the lock, so snapshot() can copy them
+        # while the UI draws mid-capture
+        with self._store_lock:
+            dev = self.devices.get(self.target_ip)
+            if dev is None:
+                dev = self.devices[self.target_ip] = DeviceProfile(self.target_ip)
+            if mac and not dev.mac:
+                dev.mac    = mac
+                dev.vendor = mac_vendor(mac)
+            if dev.ttl is None:
+                dev.ttl      = ttl
+                dev.os_guess = guess_os(ttl)
+            if qname:
+                dev.hostnames.add(qname)
+            if dport is not None:
+                dev.open_ports.add(dport)
+
+            if keep:
+                if self._sink:
+                    self._sink.write(ts, raw)
+                else:
+                    self._ts.append(ts)
+                    self._raw.append(raw)
+                    self._cat.append(cat)
+                    if len(self._raw) >= SPOOL_PACKETS:
+                        self._spill()
+
+            st = self.traffic[cat]
+            st.count += 1
+            st.bytes += len(raw)
+            if domains:
+                st.domains |= domains
+            if dport is not None:
+                st.ports.add(dport)
+
+    def _handle_frame(self, ts, frame):
+        """Fast path: account a raw Ethernet frame without building scapy layers."""
+        fields = parse_frame(frame)
+        if fields is None:
+            pkt = Ether(bytes(frame))
+            pkt.time = ts
+            self._handle(pkt)
+            return
+        self._account(ts, bytes(frame), *fields)
+
     def _handle(self, pkt):
-        if IP not in pkt:
+        """scapy dissection path - used by the sniff() fallback."""
+        ip = pkt.getlayer(IP)
+        if ip is None:
             return
-        src, dst = pkt[IP].src, pkt[IP].dst
+        src, dst = ip.src, ip.dst
         if src != self.target_ip and dst != self.target_ip:
             return
-        self.all_packets.append(pkt)
-
-        active_ip = src if src == self.target_ip else dst
-        mac = pkt[Ether].src if Ether in pkt else None
-        dev = self.devices.setdefault(active_ip, {
-            "ip": active_ip, "mac": None, "vendor": "Unknown",
-            "os_guess": "Unknown", "ttl": None,
-            "hostnames": set(), "open_ports": set()
-        })
-        if mac and not dev["mac"]:
-            dev["mac"]    = mac
-            dev["vendor"] = mac_vendor(mac)
-        if dev["ttl"] is None:
-            dev["ttl"]      = pkt[IP].ttl
-            dev["os_guess"] = guess_os(pkt[IP].ttl)
-        if DNS in pkt:
+        eth = pkt.getlayer(Ether)
+        l4  = pkt.getlayer(TCP)
+        if l4 is None:
+            l4 = pkt.getlayer(UDP)
+        dns = pkt.getlayer(DNS)
+        qname, is_query = None, False
+        if dns is not None:
             try:
-                dev["hostnames"].add(pkt[DNSQR].qname.decode().rstrip("."))
+                qname    = pkt.getlayer(DNSQR).qname.rstrip(b".")
+                is_query = dns.qr == 0
             except Exception:
                 pass
-        if TCP in pkt:
-            dev["open_ports"].add(pkt[TCP].dport)
-        if UDP in pkt:
-            dev["open_ports"].add(pkt[UDP].dport)
-
-        cat, domains = classify_packet(pkt)
-        self.traffic[cat]["count"] += 1
-        self.traffic[cat]["bytes"] += len(pkt)
-        self.traffic[cat]["domains"] |= domains
-        if TCP in pkt:
-            self.traffic[cat]["ports"].add(pkt[TCP].dport)
-        if UDP in pkt:
-            self.traffic[cat]["ports"].add(pkt[UDP].dport)
-
-    def sniff(self, duration: int, progress_cb=None):
-        """Sniff for `duration` seconds, calling progress_cb(elapsed) each second."""
+        self._account(float(pkt.time), bytes(pkt), eth.src if eth is not None else None, ip.ttl,
+                      l4.sport if l4 is not None else None,
+                      l4.dport if l4 is not None else None,
+                      qname, is_query, None)
+
+    def _sniff_ring(self, duration: int = None) -> bool:
+        """Capture via PacketRing; returns False if the ring is unavailable."""
+        try:
+            target = socket.inet_aton(self.target_ip)
+            ring   = PacketRing(self.iface, bpf=bpf_ipv4_host(self.target_ip))
+        except (OSError, AttributeError):
+            return False
+        deadline = time.monotonic() + duration if duration else float("inf")
+        done     = lambda: self._stop.is_set() or time.monotonic() >= deadline
+        with ring:
+            for ts, frame in ring.frames(done):
+                # The kernel BPF filter already matched the host; this catches
+                # frames queued before it was attached
+                if frame[12:14] != b"\x08\x00" or (frame[26:30] != target and frame[30:34] != target):
+                    continue
+                self._handle_frame(ts, frame)
+        return True
+
+    def sniff(self, duration: int = None, progress_cb=None):
+        """
+        Sniff for `duration` seconds (or until stop() if None), calling
+        progress_cb(elapsed, duration, packets, bytes) every PROGRESS_INTERVAL.
+        """
         self._stop.clear()
         def _run():
-            sniff(iface=self.iface,
-                  filter=f"host {self.target_ip}",
-                  prn=self._handle,
-                  store=False,
-                  timeout=duration,
-                  stop_filter=lambda _: self._stop.is_set())
+            if self._sniff_ring(duration):
+                return
+            # Non-Linux / no PACKET_MMAP: scapy's socket path. AsyncSniffer is
+            # stopped explicitly, so an idle link cannot keep it running (and
+            # calling _handle) past _close_writer()
+            sniffer = AsyncSniffer(iface=self.iface,
+                                   filter=f"host {self.target_ip}",
+                                   prn=self._handle,
+                                   store=False)
+            sniffer.start()
+            self._stop.wait(duration)
+            if sniffer.running:
+                sniffer.stop()
         t = threading.Thread(target=_run, daemon=True)
         t.start()
-        for i in range(duration):
-            if self._stop.is_set():
+        start, elapsed = time.monotonic(), 0
+        while duration is None or elapsed < duration:
+            # stop() wakes this immediately instead of after the tick
+            if self._stop.wait(PROGRESS_INTERVAL):
                 break
-            time.sleep(1)
+            elapsed = time.monotonic() - start
             if progress_cb:
-                progress_cb(i + 1, duration,
-                            sum(v["count"] for v in self.traffic.values()),
-                            sum(v["bytes"] for v in self.traffic.values()))
+                progress_cb(elapsed, duration, self._total_count, self._total_bytes)
         self._stop.set()
         t.join(timeout=3)
+        self._close_writer()
 
     def stop(self):
         self._stop.set()
 
     def save_pcap(self, path: str, filter_categories: list = None):
-        """Save all_packets (optionally filtered) to pcap."""
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        pkts = self.all_packets
-        if filter_categories:
-            # Re-classify each packet against selected categories
-            filtered = []
-            for pkt in pkts:
-                cat, _ = classify_packet(pkt)
-                if cat in filter_categories:
-                    filtered.append(pkt)
-            pkts = filtered
-        if pkts:
-            wrpcap(path, pkts)
-        return len(pkts)
+        """
+        Save captured packets (optionally only `filter_categories`) to pcap.
+        If the capture was already streamed to `path` via open_writer(), this
+        just returns the streamed packet count.
+        """
+        self._close_writer()
+        wanted = frozenset(filter_categories) if filter_categories else None
+        # Nothing to filter if set_category_filter() already narrowed to a subset
+        all_in = wanted is None or (self._cat_filter is not None and self._cat_filter <= wanted)
+        done   = self._sink_done
+        if done and done.path == path and all_in:
+            return done.count
+        with self._store_lock:
+            recs = self._stored()
+            if not all_in:
+                # Category was stored at capture time - a set lookup, no re-classification
+                recs = (r for r in recs if r[2] in wanted)
+            first = next(recs, None)
+            if first is None:
+                return 0
+            sink = PcapSink(path)
+            try:
+                for ts, raw, _ in chain((first,), recs):
+                    sink.write(ts, raw)
+            finally:
+                sink.close()
+        return sink.count
 
     def save_meta(self, path: str, extra: dict = None):
         meta = {
             "target_ip":  self.target_ip,
             "interface":  self.iface,
             "timestamp":  datetime.now().isoformat(),
-            "total_packets": len(self.all_packets),
+            "total_packets": self._total_count,
             "traffic_summary": {
                 cat: {
-                    "count":   v["count"],
-                    "bytes":   v["bytes"],
-                    "ports":   list(v["ports"]),
-                    "domains": list(v["domains"]),
+                    "count":   v.count,
+                    "bytes":   v.bytes,
+                    "ports":   list(v.ports),
+                    "domains": list(map(domain_str, v.domains)),
                 }
-                for cat, v in self.traffic.items() if v["count"] > 0
+                for cat, v in self.traffic.items() if v.count > 0
             },
             "devices": {
                 ip: {
-                    "mac":        d["mac"],
-                    "vendor":     d["vendor"],
-                    "os_guess":   d["os_guess"],
-                    "ttl":        d["ttl"],
-                    "hostnames":  list(d["hostnames"]),
-                    "open_ports": list(d["open_ports"]),
+                    "mac":        d.mac,
+                    "vendor":     d.vendor,
+                    "os_guess":   d.os_guess,
+                    "ttl":        d.ttl,
+                    "hostnames":  list(map(domain_str, d.hostnames)),
+                    "open_ports": list(d.open_ports),
                 }
                 for ip, d in self.devices.items()
             }
@@ -250,9 +721,20 @@ class CaptureEngine:
         if extra:
             meta.update(extra)
         os.makedirs(os.path.dirname(path), exist_ok=True)
-        with open(path, "w") as f:
-            json.dump(meta, f, indent=2)
+        dump_json(path, meta)
         return meta
 
+    def snapshot(self):
+        """
+        (active traffic, devices) copied with their sets under _store_lock -
+        safe to iterate while sniff() is still running.
+        """
+        with self._store_lock:
+            traffic = {k: replace(v, ports=set(v.ports), domains=set(v.domains))
+                       for k, v in self.traffic.items() if v.count > 0}
+            devices = {ip: replace(d, hostnames=set(d.hostnames), open_ports=set(d.open_ports))
+                       for ip, d in self.devices.items()}
+        return traffic, devices
+
     def active_traffic(self):
-        return {k: v for k, v in self.traffic.items() if v["count"] > 0}
+        return {k: v for k, v in self.traffic.items() if v.count > 0}
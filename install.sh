@@ -27,7 +27,7 @@ apt-get install -y -qq \
 
 echo "  [*] Installing Python packages..."
 pip3 install --break-system-packages -q \
-  scapy rich manuf cryptography dpkt requests
+  scapy rich manuf cryptography dpkt requests orjson deflate
 
 echo ""
 echo "  [✓] Installation complete!"
@@ -0,0 +1,57 @@
+"""JSON file helpers - orjson fast path with stdlib json fallback."""
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(o):
+    """
+    Serialize sets (hostnames, ports, domains) and MessageLists as lists on
+    the fly. Anything else - bytes included - still raises TypeError.
+    """
+    from core.reconstructor import MessageList     # lazy: engine imports this module
+    if isinstance(o, (set, frozenset, MessageList)):
+        return list(o)
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+def _dumps(obj) -> bytes:
+    if orjson:
+        return orjson.dumps(obj, default=_default,
+                            option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, indent=2, default=_default).encode()
+
+
+def dump_json(path: str, obj) -> None:
+    """Write `obj` to `path` as 2-space indented JSON."""
+    with open(path, "wb") as f:
+        f.write(_dumps(obj))
+
+
+def dump_json_stream(path: str, mapping: dict) -> None:
+    """
+    Write a dict (e.g. platform -> messages) one top-level entry at a time,
+    so only the largest single value is ever encoded in memory.
+    Output matches dump_json(path, mapping).
+    """
+    with open(path, "wb") as f:
+        f.write(b"{")
+        for i, (key, value) in enumerate(mapping.items()):
+            f.write(b",\n  " if i else b"\n  ")
+            f.write(_dumps(str(key)))
+            f.write(b": ")
+            f.write(_dumps(value).replace(b"\n", b"\n  "))
+        f.write(b"\n}" if mapping else b"}")
+
+
+def load_json(path: str):
+    """Read and parse the JSON document at `path`."""
+    if orjson:
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
+    with open(path) as f:
+        return json.load(f)
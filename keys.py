@@ -0,0 +1,47 @@
+"""Keypress helpers - single-key pauses that don't wait on line input."""
+
+import os, sys, time
+
+try:
+    import termios, tty, select
+except ImportError:             # Windows
+    termios = None
+
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+
+def wait_key(prompt: str = "", timeout: float = None) -> None:
+    """
+    Print `prompt` and return on the next keypress, or after `timeout`
+    seconds. Uses cbreak mode + select on POSIX ttys and msvcrt on Windows;
+    piped stdin falls back to reading a line.
+    """
+    if prompt:
+        sys.stdout.write(prompt)
+        sys.stdout.flush()
+
+    if msvcrt:
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while not msvcrt.kbhit():
+            if deadline is not None and time.monotonic() >= deadline:
+                return
+            time.sleep(0.05)
+        msvcrt.getwch()
+        return
+
+    if termios is None or not sys.stdin.isatty():
+        sys.stdin.readline()
+        return
+
+    fd  = sys.stdin.fileno()
+    old = termios.tcgetattr(fd)
+    try:
+        tty.setcbreak(fd)
+        if select.select([fd], [], [], timeout)[0]:
+            os.read(fd, 1)
+    finally:
+        termios.tcsetattr(fd, termios.TCSADRAIN, old)
+    sys.stdout.write("\n")
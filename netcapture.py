@@ -6,7 +6,7 @@
 ╚═══════════════════════════════════════════════════════╝
 """
 
-import os, sys, subprocess, importlib
+import os, sys, subprocess, importlib, hashlib
 
 # ── Root check ──────────────────────────────────────────
 if os.geteuid() != 0:
@@ -22,7 +22,16 @@ DEPS = {
     "dpkt":    "dpkt",
 }
 
+# Once every dep has imported, a stamp keyed on DEPS and the interpreter
+# lets later launches skip the import probes entirely.
+DEPS_STAMP = os.path.join(
+    os.path.expanduser("~/.cache/netcapture"),
+    "deps-" + hashlib.sha1(repr((sorted(DEPS.items()), sys.executable)).encode()).hexdigest()[:12] + ".ok",
+)
+
 def install_deps():
+    if os.path.exists(DEPS_STAMP):
+        return
     missing = []
     for mod, pkg in DEPS.items():
         try:
@@ -35,6 +44,11 @@ def install_deps():
             [sys.executable, "-m", "pip", "install", "--break-system-packages", "-q"] + missing,
             check=True
         )
+    try:
+        os.makedirs(os.path.dirname(DEPS_STAMP), exist_ok=True)
+        open(DEPS_STAMP, "w").close()
+    except OSError:
+        pass
 
 install_deps()
 
@@ -0,0 +1,94 @@
+"""Output tree helpers - locate recent capture files under ~/netcapture_output."""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+OUTPUT_DIR = os.path.expanduser("~/netcapture_output")
+
+# stat() is the slow part on NFS / remote mounts; above this many candidate
+# files the calls are issued from a thread pool so their latency overlaps.
+STAT_WORKERS   = 16
+PARALLEL_STATS = 32
+
+_KB, _MB = 1024, 1048576
+
+_scan_pool  = None
+_scan_cache = {}    # (root, ext) -> ({dir: st_mtime_ns}, matching file paths)
+
+
+def _stat(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return path, st.st_size, st.st_mtime
+
+
+def fmt_bytes(b: int) -> str:
+    """Human byte count for table cells: '512 B', '1,234 KB', '3.2 MB'."""
+    return f"{b:,} B" if b < _KB else (f"{b//_KB:,} KB" if b < _MB else f"{b/_MB:.1f} MB")
+
+
+def _dirs_unchanged(dirs: dict) -> bool:
+    try:
+        return all(os.stat(d).st_mtime_ns == m for d, m in dirs.items())
+    except OSError:
+        return False
+
+
+def scan_outputs(root: str = OUTPUT_DIR, ext: str = ".pcap", limit: int = 10) -> list:
+    """
+    Walk `root` once with os.scandir and return the `limit` newest files
+    ending in `ext` as (path, size, mtime) tuples, newest first. The
+    walk is skipped while no directory in the tree has changed its mtime;
+    files are always re-stat'ed, since one growing or rewritten in place
+    (e.g. the pcap of a running capture) leaves its directory untouched.
+    """
+    cached = _scan_cache.get((root, ext))
+    if cached and _dirs_unchanged(cached[0]):
+        return _newest(cached[1], limit)
+
+    dirs, paths, stack = {}, [], [root]
+    while stack:
+        d = stack.pop()
+        try:
+            # stat before listing: a change in between only forces a rescan
+            dirs[d] = os.stat(d).st_mtime_ns
+            it = os.scandir(d)
+        except OSError:
+            continue
+        with it:
+            for entry in it:
+                if entry.name.startswith("."):
+                    continue
+                try:
+                    if entry.is_dir():
+                        stack.append(entry.path)
+                    elif entry.name.endswith(ext):
+                        paths.append(entry.path)
+                except OSError:
+                    continue
+
+    if root in dirs:        # a missing root is re-checked next time
+        _scan_cache[(root, ext)] = (dirs, paths)
+    return _newest(paths, limit)
+
+
+def _newest(paths: list, limit: int) -> list:
+    """stat `paths` and return the `limit` most recently modified, newest first."""
+    if len(paths) > PARALLEL_STATS:
+        with ThreadPoolExecutor(max_workers=STAT_WORKERS) as ex:
+            found = list(ex.map(_stat, paths))
+    else:
+        found = [_stat(p) for p in paths]
+    found = [f for f in found if f]
+    found.sort(key=lambda x: -x[2])
+    return found[:limit]
+
+
+def scan_outputs_async(**kwargs):
+    """Start scan_outputs(**kwargs) in the background; returns a Future."""
+    global _scan_pool
+    if _scan_pool is None:
+        _scan_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scan_outputs")
+    return _scan_pool.submit(scan_outputs, **kwargs)
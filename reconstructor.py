@@ -5,53 +5,140 @@ Supports: HTTP plaintext, DNS queries, SIP/VoIP metadata, WebSocket frames,
 XMPP (Jabber/WhatsApp protocol base), multipart payloads.
 """
 
-import re, json, base64, gzip, zlib
+import os, re, json, base64, zlib, socket, mmap, struct
+import xml.etree.ElementTree as ET
+from collections import defaultdict
+from collections.abc import Sequence
+from multiprocessing import Pool
 from datetime  import datetime
+from functools import lru_cache
 from urllib.parse import unquote_plus, urlparse
 
 try:
-    from scapy.all import rdpcap, IP, TCP, UDP, Raw, DNS, DNSQR, DNSRR
+    from scapy.all import PcapReader, IP, TCP, UDP, Raw, DNS, DNSQR, DNSRR
     SCAPY = True
 except ImportError:
     SCAPY = False
 
+try:
+    import dpkt
+    DPKT = True
+except ImportError:
+    DPKT = False
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+try:
+    import deflate      # libdeflate bindings - faster whole-buffer gunzip
+except ImportError:
+    deflate = None
+
+
+# ── Result storage ──────────────────────────────────────
+
+class MessageList(Sequence):
+    """
+    One platform's messages, stored as a values tuple per row plus a key
+    tuple shared by every row of the same shape - no dict per message.
+    Indexing, slicing and iteration hand back ordinary dicts.
+    """
+    __slots__ = ("_keys", "_vals")
+    _schemas  = {}
+
+    def __init__(self, msgs=()):
+        self._keys, self._vals = [], []
+        self.extend(msgs)
+
+    def append(self, msg: dict):
+        keys = tuple(msg)
+        self._keys.append(self._schemas.setdefault(keys, keys))
+        self._vals.append(tuple(msg.values()))
+
+    def extend(self, msgs):
+        if isinstance(msgs, MessageList):
+            self._keys += msgs._keys
+            self._vals += msgs._vals
+        else:
+            for m in msgs:
+                self.append(m)
+
+    def __len__(self):
+        return len(self._vals)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [dict(zip(k, v)) for k, v in zip(self._keys[i], self._vals[i])]
+        return dict(zip(self._keys[i], self._vals[i]))
+
+    def __iter__(self):
+        return map(dict, map(zip, self._keys, self._vals))
+
 
 # ── Helpers ─────────────────────────────────────────────
 
-def _ts(pkt):
+READ_BUFFER = 1 << 20   # file buffer for sequential pcap reads (fewer read() syscalls)
+MAX_BODY    = 8 << 20   # cap on one decompressed HTTP body
+
+@lru_cache(maxsize=4096)
+def _fmt_sec(sec: int) -> str:
+    return datetime.fromtimestamp(sec).strftime("%Y-%m-%d %H:%M:%S")
+
+def _fmt_ts(t):
+    # Whole seconds only, so packets in the same second share one strftime
     try:
-        return datetime.fromtimestamp(float(pkt.time)).strftime("%Y-%m-%d %H:%M:%S")
+        return _fmt_sec(int(float(t)))
     except Exception:
         return "Unknown"
 
+def _ts(pkt):
+    return _fmt_ts(pkt.time)
+
+def _inflate(data: bytes) -> bytes:
+    """gzip / zlib / raw DEFLATE body -> at most MAX_BODY decompressed bytes."""
+    # libdeflate needs the complete member; the gzip trailer's size bounds it
+    if deflate and data[:2] == b"\x1f\x8b" and int.from_bytes(data[-4:], "little") <= MAX_BODY:
+        try:
+            return deflate.gzip_decompress(data)
+        except Exception:
+            pass                # truncated at the packet boundary - stream it
+    # One streaming pass capped at MAX_BODY; unlike gzip.decompress it
+    # returns what it has for a cut-off body. wbits +32 accepts gzip and zlib.
+    try:
+        return zlib.decompressobj(zlib.MAX_WBITS | 32).decompress(data, MAX_BODY)
+    except zlib.error:          # "deflate" sent as raw DEFLATE, no zlib header
+        return zlib.decompressobj(-zlib.MAX_WBITS).decompress(data, MAX_BODY)
+
 def _decode_body(data: bytes, encoding: str = "") -> str:
     try:
-        if "gzip" in encoding:
-            data = gzip.decompress(data)
-        elif "deflate" in encoding:
-            data = zlib.decompress(data)
+        if "gzip" in encoding or "deflate" in encoding:
+            data = _inflate(data)
         return data.decode("utf-8", errors="replace")
     except Exception:
         return data.decode("latin-1", errors="replace")
 
+# First four bytes of every request method we parse, and of a status line
+_HTTP_PREFIX4 = frozenset((b"GET ", b"POST", b"PUT ", b"DELE", b"PATC", b"HEAD", b"OPTI", b"HTTP"))
+
 def _parse_http(raw: bytes):
     """Very lightweight HTTP/1.x parser. Returns dict or None."""
+    # Reject non-HTTP payloads (TLS, binary) before decoding anything
+    if raw[:4] not in _HTTP_PREFIX4:
+        return None
     try:
-        text = raw.decode("utf-8", errors="replace")
-        lines = text.split("\r\n")
-        if not lines:
-            return None
-        first = lines[0]
+        # Only the head is split into lines; the body is decoded in one piece
+        end  = raw.find(b"\r\n\r\n")
+        head = (raw if end < 0 else raw[:end]).decode("utf-8", errors="replace")
+        first, *lines = head.split("\r\n")
         headers = {}
-        body_start = 0
-        for i, line in enumerate(lines[1:], 1):
-            if line == "":
-                body_start = i + 1
-                break
+        for line in lines:
             if ":" in line:
                 k, _, v = line.partition(":")
                 headers[k.strip().lower()] = v.strip()
-        body = "\r\n".join(lines[body_start:]) if body_start else ""
+        body = _decode_body(raw[end + 4:], headers.get("content-encoding", "")) if end >= 0 else ""
 
         if first.startswith(("GET","POST","PUT","DELETE","PATCH","HEAD","OPTIONS")):
             method, path, *_ = first.split(" ", 2)
@@ -77,67 +164,133 @@ def _parse_http(raw: bytes):
     return None
 
 
+def _ws_unmask(data: bytes, mask: bytes) -> bytes:
+    """XOR `data` with the repeating 4-byte WebSocket mask as one big-int op."""
+    n = len(data)
+    key = (mask * (n // 4 + 1))[:n]
+    return (int.from_bytes(data, "little") ^ int.from_bytes(key, "little")).to_bytes(n, "little")
+
+
+_WS_OPCODES = frozenset((0, 1, 2, 8, 9, 10))   # continuation, text, binary, close, ping, pong
+_WS_LEN16   = struct.Struct(">H")
+_WS_LEN64   = struct.Struct(">Q")
+
+
 def _extract_ws_frames(payload: bytes):
     """Minimal WebSocket frame parser."""
     frames = []
-    i = 0
-    while i + 2 <= len(payload):
+    i, n = 0, len(payload)
+    while i + 2 <= n:
         try:
             b0, b1 = payload[i], payload[i+1]
             opcode  = b0 & 0x0F
-            masked  = (b1 & 0x80) != 0
+            masked  = b1 & 0x80
             length  = b1 & 0x7F
             i += 2
             if length == 126:
-                length = int.from_bytes(payload[i:i+2], "big"); i += 2
+                length = _WS_LEN16.unpack_from(payload, i)[0]; i += 2
             elif length == 127:
-                length = int.from_bytes(payload[i:i+8], "big"); i += 8
-            mask = payload[i:i+4] if masked else b"\x00\x00\x00\x00"
+                length = _WS_LEN64.unpack_from(payload, i)[0]; i += 8
+            mask_off = i
             if masked: i += 4
-            data = payload[i:i+length]
-            if masked:
-                data = bytes(b ^ mask[j % 4] for j, b in enumerate(data))
-            i += length
-            if opcode in (1, 2):  # text / binary
+            start, i = i, i + length
+            if opcode in (1, 2):  # text / binary - other frames are skipped unsliced
+                data = payload[start:i]
+                if masked:
+                    data = _ws_unmask(data, payload[mask_off:mask_off + 4])
                 frames.append(data.decode("utf-8", errors="replace"))
         except Exception:
             break
     return frames
 
 
+# First four bytes of a SIP status line or of the request methods we report
+_SIP_TOKENS = frozenset((b"SIP/", b"INVI", b"ACK ", b"BYE ", b"REGI", b"OPTI", b"NOTI"))
+
+
+def _looks_sip(raw: bytes) -> bool:
+    """Port-independent SIP check: method/status token and a SIP/2.0 first line."""
+    if raw[:4] not in _SIP_TOKENS:
+        return False
+    eol = raw.find(b"\r\n", 0, 512)
+    return raw.find(b"SIP/2.0", 0, eol if eol >= 0 else 512) >= 0
+
+
 def _sip_parse(raw: bytes):
     """Minimal SIP message parser."""
     try:
-        text = raw.decode("utf-8", errors="replace")
-        lines = text.split("\r\n")
-        if not lines[0].startswith(("SIP/","INVITE","ACK","BYE","REGISTER","OPTIONS","NOTIFY")):
+        if raw[:4] not in _SIP_TOKENS:
             return None
+        # Split the header block as bytes (the SDP body is never needed) and
+        # decode only the fields returned
+        end = raw.find(b"\r\n\r\n")
+        first, *lines = (raw if end < 0 else raw[:end]).split(b"\r\n")
         headers = {}
-        for line in lines[1:]:
-            if ":" in line:
-                k, _, v = line.partition(":")
-                headers[k.strip().lower()] = v.strip()
+        for line in lines:
+            k, sep, v = line.partition(b":")
+            if sep:
+                headers[k.strip().lower()] = v
+        field = lambda name: headers.get(name, b"").strip().decode("utf-8", errors="replace")
         return {
             "type":    "sip",
-            "first":   lines[0],
-            "from":    headers.get("from", ""),
-            "to":      headers.get("to", ""),
-            "call_id": headers.get("call-id", ""),
-            "subject": headers.get("subject", ""),
+            "first":   first.decode("utf-8", errors="replace"),
+            "from":    field(b"from"),
+            "to":      field(b"to"),
+            "call_id": field(b"call-id"),
+            "subject": field(b"subject"),
         }
     except Exception:
         return None
 
 
+_RE_XMPP_BODY = re.compile(rb"<body[^>]*>(.*?)</body>", re.DOTALL)
+_RE_FROM      = re.compile(rb'from=["\']([^"\']+)["\']')
+_RE_TO        = re.compile(rb'\bto=["\']([^"\']+)["\']')
+_RE_FB_BODY   = re.compile(r"body=([^&]+)")
+_RE_TP_BODY   = re.compile(r'"body"\s*:\s*"([^"]+)"')
+
+
+# Synthetic root so stream fragments parse: binds the default and stream: prefixes
+_XMPP_ROOT = b'<r xmlns="jabber:client" xmlns:stream="http://etherx.jabber.org/streams">'
+
+
+def _xmpp_pull(raw: bytes):
+    """One expat pass: (from, to, bodies) of the <body> elements in `raw`."""
+    parser = ET.XMLPullParser(("start", "end"))
+    frm = to = None
+    bodies, stack = [], []
+    parser.feed(_XMPP_ROOT)
+    parser.feed(raw)
+    try:
+        # feed() queues a parse error; read_events() raises it after the good events
+        for ev, el in parser.read_events():
+            if ev == "start":
+                stack.append(el)
+                continue
+            stack.pop()
+            if el.tag.rpartition("}")[2] == "body":
+                bodies.append("".join(el.itertext()))
+                if frm is None and stack:
+                    frm, to = stack[-1].get("from", ""), stack[-1].get("to", "")
+    except ET.ParseError:
+        pass            # keep whatever parsed before the fragment broke off
+    return frm or "", to or "", bodies
+
+
 def _xmpp_parse(raw: bytes):
     """Extract text from XMPP/Jabber XML (WhatsApp uses a binary variant, but base XMPP is XML)."""
+    if b"<body" not in raw:
+        return None
     try:
-        text = raw.decode("utf-8", errors="replace")
-        bodies = re.findall(r"<body[^>]*>(.*?)</body>", text, re.DOTALL)
-        froms  = re.findall(r'from=["\']([^"\']+)["\']', text)
-        tos    = re.findall(r'\bto=["\']([^"\']+)["\']', text)
+        frm, to, bodies = _xmpp_pull(raw)
+        if not bodies:
+            # Not well-formed enough for expat (cut mid-tag, bad UTF-8): regex on the bytes
+            dec    = lambda b: b.decode("utf-8", errors="replace")
+            bodies = list(map(dec, _RE_XMPP_BODY.findall(raw)))
+            frm, to = _RE_FROM.search(raw), _RE_TO.search(raw)
+            frm, to = dec(frm.group(1)) if frm else "", dec(to.group(1)) if to else ""
         if bodies:
-            return {"type": "xmpp", "from": froms[0] if froms else "", "to": tos[0] if tos else "", "bodies": bodies}
+            return {"type": "xmpp", "from": frm, "to": to, "bodies": bodies}
     except Exception:
         pass
     return None
@@ -157,7 +310,7 @@ def parse_facebook(http_obj, ts):
     # Messenger send endpoint
     if "/messaging" in path or "message_send" in path.lower():
         body_text = unquote_plus(body)
-        m = re.search(r"body=([^&]+)", body_text)
+        m = _RE_FB_BODY.search(body_text)
         if m:
             msgs.append({
                 "platform": "Facebook Messenger",
@@ -168,7 +321,7 @@ def parse_facebook(http_obj, ts):
     # Graph API messages
     if "graph.facebook.com" in headers.get("host","") and "messages" in path:
         try:
-            jdata = json.loads(body)
+            jdata = _json_loads(body)
             for item in jdata.get("data", []):
                 msgs.append({
                     "platform":  "Facebook Messenger",
@@ -191,7 +344,7 @@ def parse_whatsapp(http_obj, raw_payload, ts):
         for frame in frames:
             # WhatsApp Web JSON messages contain type & body
             try:
-                jdata = json.loads(frame)
+                jdata = _json_loads(frame)
                 # Format 1: array messages
                 if isinstance(jdata, list) and len(jdata) >= 2:
                     tag, data = jdata[0], jdata[1]
@@ -223,7 +376,7 @@ def parse_textplus(http_obj, ts):
     if "textplus" in http_obj.get("headers",{}).get("host",""):
         if "/messages" in path or "/send" in path:
             body_dec = unquote_plus(body)
-            m = re.search(r'"body"\s*:\s*"([^"]+)"', body_dec)
+            m = _RE_TP_BODY.search(body_dec)
             if m:
                 msgs.append({
                     "platform":  "TextPlus",
@@ -250,121 +403,366 @@ def parse_sip_voip(raw_payload, ts):
     return msgs
 
 
+def _dns_query(name, src, ts):
+    return {
+        "platform":  "DNS Query",
+        "timestamp": ts,
+        "query":     name,
+        "src":       src,
+    }
+
+
 def parse_dns(pkt, ts):
     msgs = []
     if DNS in pkt and pkt[DNS].qr == 0:
         try:
             name = pkt[DNSQR].qname.decode().rstrip(".")
-            msgs.append({
-                "platform":  "DNS Query",
-                "timestamp": ts,
-                "query":     name,
-                "src":       pkt[IP].src if IP in pkt else "",
-            })
+            msgs.append(_dns_query(name, pkt[IP].src if IP in pkt else "", ts))
         except Exception:
             pass
     return msgs
 
 
+def _parse_dns_dpkt(data: bytes, src, ts):
+    msgs = []
+    try:
+        dns = dpkt.dns.DNS(data)
+        if dns.qr == dpkt.dns.DNS_Q and dns.qd:
+            msgs.append(_dns_query(dns.qd[0].name.rstrip("."), src, ts))
+    except Exception:
+        pass
+    return msgs
+
+
 # ── Main reconstruct function ────────────────────────────
 
+SIP_PORTS  = (5060, 5061)
+XMPP_PORTS = (5222, 5223)
+WS_PORTS   = (80, 443, 8080)
+DNS_PORTS  = (53, 5353)
+
+
+def _route_xmpp(add, ts, raw, host):
+    xmpp = _xmpp_parse(raw)
+    if xmpp:
+        for body in xmpp["bodies"]:
+            add("XMPP/Jabber (Messaging)", {
+                "platform":  "XMPP",
+                "timestamp": ts,
+                "from":      xmpp["from"],
+                "to":        xmpp["to"],
+                "content":   body,
+            })
+
+
+def _route_ws(add, ts, raw, host):
+    # TLS records (0x14-0x17) and HTTP text never start with a defined opcode
+    if raw[0] & 0x0F not in _WS_OPCODES:
+        return
+    for frame in _extract_ws_frames(raw)[:5]:
+        add("WebSocket Frames", {
+            "platform":  "WebSocket",
+            "timestamp": ts,
+            "host":      host,
+            "content":   frame[:300],
+        })
+
+
+# TCP destination port -> payload handler, one dict lookup per packet
+_TCP_HANDLERS = {**{p: _route_xmpp for p in XMPP_PORTS}, **{p: _route_ws for p in WS_PORTS}}
+
+
+# Host substring(s) -> (result platform, parser(http, raw, ts)), in dispatch order
+_HOST_DISPATCH = (
+    (("facebook", "messenger"), "Facebook Messenger", lambda http, raw, ts: parse_facebook(http, ts)),
+    (("whatsapp",),             "WhatsApp",           parse_whatsapp),
+    (("textplus",),             "TextPlus",           lambda http, raw, ts: parse_textplus(http, ts)),
+)
+
+
+@lru_cache(maxsize=1024)
+def _host_handlers(host: str) -> tuple:
+    """The (platform, parser) pairs that apply to an HTTP Host header."""
+    return tuple((platform, parse) for needles, platform, parse in _HOST_DISPATCH
+                 if any(n in host for n in needles))
+
+
+def _route_payload(add, ts, is_tcp, is_udp, sport, dport, raw):
+    """Feed one L4 payload through the SIP / HTTP / XMPP / WebSocket parsers."""
+    # ── SIP/VoIP ─────────────────────────────────────
+    # By port for UDP 5060/5061, by payload heuristic anywhere else
+    sip_port = is_udp and (dport in SIP_PORTS or sport in SIP_PORTS)
+    if sip_port or _looks_sip(raw):
+        if raw:
+            for m in parse_sip_voip(raw, ts):
+                add("VoIP / SIP", m)
+        return
+
+    if not raw:
+        return
+
+    # ── HTTP parse ────────────────────────────────────
+    http = _parse_http(raw)
+    host = ""
+    if http:
+        host = http.get("headers",{}).get("host","")
+
+    # ── Route to platform parsers ─────────────────────
+    handlers = _host_handlers(host) if host else ()
+    for platform, parse in handlers:
+        for m in parse(http, raw, ts):
+            add(platform, m)
+
+    # XMPP / WebSocket by TCP destination port
+    handler = _TCP_HANDLERS.get(dport) if is_tcp else None
+    if handler:
+        handler(add, ts, raw, host)
+
+    # Generic HTTP requests (log URLs)
+    if http and http["type"] == "request" and not handlers:
+        path = http.get("path","")
+        if path and path != "/":
+            add("HTTP Requests", {
+                "platform":  "HTTP",
+                "timestamp": ts,
+                "method":    http.get("method",""),
+                "host":      host,
+                "path":      path[:120],
+                "user_agent": http.get("headers",{}).get("user-agent",""),
+            })
+
+
 def reconstruct(pcap_path: str, categories: list = None) -> dict:
     """
     Load pcap and reconstruct messages.
     Returns dict: { platform_name: [message_dict, ...] }
+    Uses dpkt when installed; scapy dissection is the fallback.
     """
+    if DPKT:
+        return reconstruct_dpkt(pcap_path, categories)
+    return reconstruct_scapy(pcap_path, categories)
+
+
+def reconstruct_scapy(pcap_path: str, categories: list = None) -> dict:
+    """reconstruct() by full scapy dissection of every packet."""
     if not SCAPY:
         return {"error": ["Scapy not available"]}
 
     try:
-        packets = rdpcap(pcap_path)
+        # Streamed one packet at a time instead of rdpcap's full in-memory list,
+        # through a large read buffer rather than the default 8 KiB
+        packets = PcapReader(open(pcap_path, "rb", buffering=READ_BUFFER))
     except Exception as e:
         return {"error": [{"content": str(e)}]}
 
     results = {}
 
     def add(platform, msg):
-        results.setdefault(platform, []).append(msg)
+        results.setdefault(platform, MessageList()).append(msg)
 
-    for pkt in packets:
-        ts = _ts(pkt)
-        raw = bytes(pkt[Raw].load) if Raw in pkt else b""
+    with packets:
+        for pkt in packets:
+            ts = _ts(pkt)
+            raw = bytes(pkt[Raw].load) if Raw in pkt else b""
 
-        # ── DNS ───────────────────────────────────────────
-        if DNS in pkt:
-            for m in parse_dns(pkt, ts):
-                add("DNS Queries", m)
-            continue
+            # ── DNS ───────────────────────────────────────
+            if DNS in pkt:
+                for m in parse_dns(pkt, ts):
+                    add("DNS Queries", m)
+                continue
 
-        # ── SIP/VoIP ─────────────────────────────────────
-        if UDP in pkt and raw and pkt[UDP].dport in (5060,5061) or pkt[UDP].sport in (5060,5061) if UDP in pkt else False:
-            for m in parse_sip_voip(raw, ts):
-                add("VoIP / SIP", m)
-            continue
-
-        if not raw:
-            continue
-
-        # ── HTTP parse ────────────────────────────────────
-        http = _parse_http(raw)
-        host = ""
-        if http:
-            host = http.get("headers",{}).get("host","")
-
-        # ── Route to platform parsers ─────────────────────
-        is_fb   = "facebook" in host or "messenger" in host
-        is_wa   = "whatsapp" in host
-        is_tp   = "textplus" in host
-        is_xmpp = False
-
-        if is_fb:
-            for m in parse_facebook(http, ts):
-                add("Facebook Messenger", m)
-
-        if is_wa:
-            for m in parse_whatsapp(http, raw, ts):
-                add("WhatsApp", m)
-
-        if is_tp:
-            for m in parse_textplus(http, ts):
-                add("TextPlus", m)
-
-        # XMPP (port 5222)
-        if TCP in pkt and pkt[TCP].dport in (5222, 5223):
-            xmpp = _xmpp_parse(raw)
-            if xmpp:
-                for body in xmpp["bodies"]:
-                    add("XMPP/Jabber (Messaging)", {
-                        "platform":  "XMPP",
-                        "timestamp": ts,
-                        "from":      xmpp["from"],
-                        "to":        xmpp["to"],
-                        "content":   body,
-                    })
+            is_tcp, is_udp = TCP in pkt, UDP in pkt
+            l4 = pkt[TCP] if is_tcp else (pkt[UDP] if is_udp else None)
+            sport = l4.sport if l4 is not None else None
+            dport = l4.dport if l4 is not None else None
+            _route_payload(add, ts, is_tcp, is_udp, sport, dport, raw)
 
-        # WebSocket generic
-        if TCP in pkt and pkt[TCP].dport in (80, 443, 8080):
-            frames = _extract_ws_frames(raw)
-            if frames:
-                for frame in frames[:5]:
-                    add("WebSocket Frames", {
-                        "platform":  "WebSocket",
-                        "timestamp": ts,
-                        "host":      host,
-                        "content":   frame[:300],
-                    })
+    return results
 
-        # Generic HTTP requests (log URLs)
-        if http and http["type"] == "request" and not (is_fb or is_wa or is_tp):
-            path = http.get("path","")
-            if path and path != "/":
-                add("HTTP Requests", {
-                    "platform":  "HTTP",
-                    "timestamp": ts,
-                    "method":    http.get("method",""),
-                    "host":      host,
-                    "path":      path[:120],
-                    "user_agent": http.get("headers",{}).get("user-agent",""),
-                })
+
+# ── dpkt fast path ───────────────────────────────────────
+
+def _dpkt_ip(link, buf):
+    """Return the IP/IP6 layer of a pcap record for the given link type."""
+    if link == dpkt.pcap.DLT_EN10MB:
+        ip = dpkt.ethernet.Ethernet(buf).data
+    elif link == dpkt.pcap.DLT_LINUX_SLL:
+        ip = dpkt.sll.SLL(buf).data
+    else:
+        ip = dpkt.ip.IP(buf)
+    return ip if isinstance(ip, (dpkt.ip.IP, dpkt.ip6.IP6)) else None
+
+
+def _dpkt_record(add, link, t, buf):
+    """Reconstruct one pcap record, routing whatever it carries to `add`."""
+    try:
+        ip = _dpkt_ip(link, buf)
+    except Exception:
+        return
+    if ip is None:
+        return
+    l4 = ip.data
+    is_tcp = isinstance(l4, dpkt.tcp.TCP)
+    is_udp = isinstance(l4, dpkt.udp.UDP)
+    if not (is_tcp or is_udp):
+        return
+    ts  = _fmt_ts(t)
+    raw = bytes(l4.data)
+
+    # ── DNS ───────────────────────────────────────────
+    if l4.dport in DNS_PORTS or l4.sport in DNS_PORTS:
+        src = socket.inet_ntop(socket.AF_INET6 if isinstance(ip, dpkt.ip6.IP6)
+                               else socket.AF_INET, ip.src)
+        for m in _parse_dns_dpkt(raw[2:] if is_tcp else raw, src, ts):
+            add("DNS Queries", m)
+        return
+
+    _route_payload(add, ts, is_tcp, is_udp, l4.sport, l4.dport, raw)
+
+
+def _open_mapped(path: str):
+    """
+    Read-only mmap of `path` (file-like: read/seek/tell) advised for
+    sequential access, so the kernel reads ahead in large batches.
+    Falls back to a plain file for empty files or where mmap fails.
+    """
+    f = open(path, "rb", buffering=READ_BUFFER)
+    try:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (ValueError, OSError):
+        return f
+    f.close()
+    if hasattr(mm, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+        mm.madvise(mmap.MADV_SEQUENTIAL)
+    return mm
+
+
+def reconstruct_dpkt(pcap_path: str, categories: list = None) -> dict:
+    """
+    Same output as reconstruct_scapy(), but parses records with dpkt
+    instead of building scapy layer objects for every packet.
+    """
+    if not DPKT:
+        return reconstruct_scapy(pcap_path, categories)
+
+    results = {}
+
+    def add(platform, msg):
+        results.setdefault(platform, MessageList()).append(msg)
+
+    try:
+        fh = _open_mapped(pcap_path)
+    except OSError as e:
+        return {"error": [{"content": str(e)}]}
+
+    with fh:
+        try:
+            reader = dpkt.pcap.Reader(fh)
+        except Exception as e:
+            if SCAPY:
+                # pcapng and other formats dpkt.pcap can't read
+                return reconstruct_scapy(pcap_path, categories)
+            return {"error": [{"content": str(e)}]}
+
+        link = reader.datalink()
+        for t, buf in reader:
+            _dpkt_record(add, link, t, buf)
 
     return results
+
+
+# ── Parallel reconstruct ─────────────────────────────────
+
+PCAP_HDR_LEN       = 24
+PCAP_REC_LEN       = 16
+PARALLEL_MIN_BYTES = 16 << 20   # below this, process start-up outweighs the gain
+
+_PCAP_MAGIC = {
+    b"\xd4\xc3\xb2\xa1": ("<", 1e6), b"\xa1\xb2\xc3\xd4": (">", 1e6),
+    b"\x4d\x3c\xb2\xa1": ("<", 1e9), b"\xa1\xb2\x3c\x4d": (">", 1e9),
+}
+
+
+def pcap_layout(mm):
+    """Return (record header struct, ts divisor, link type) for a classic pcap."""
+    try:
+        order, divisor = _PCAP_MAGIC[bytes(mm[:4])]
+    except KeyError:
+        raise ValueError("not a classic pcap file")
+    link = struct.unpack_from(order + "I", mm, 20)[0]
+    return struct.Struct(order + "IIII"), divisor, link
+
+
+def _pcap_record_offsets(mm, nparts: int) -> list:
+    """
+    Split the records of a mapped pcap into `nparts` near-equal byte ranges.
+    Walks the 16-byte record headers (incl_len) so every range starts on a
+    record boundary; returns [(start, end), ...].
+    """
+    rec, _, _ = pcap_layout(mm)
+    size  = len(mm)
+    step  = max((size - PCAP_HDR_LEN) // max(nparts, 1), 1)
+    start = off = PCAP_HDR_LEN
+    ranges, target = [], PCAP_HDR_LEN + step
+    while off + PCAP_REC_LEN <= size:
+        if off >= target:
+            ranges.append((start, off))
+            start, target = off, off + step
+        off += PCAP_REC_LEN + rec.unpack_from(mm, off)[2]
+    if start < size:
+        ranges.append((start, size))
+    return ranges
+
+
+def reconstruct_range(job) -> dict:
+    """Pool worker: reconstruct the records in byte range [start, end) of a pcap."""
+    path, start, end = job
+    results = {}
+
+    def add(platform, msg):
+        results.setdefault(platform, MessageList()).append(msg)
+
+    with open(path, "rb") as f, \
+         mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        rec, divisor, link = pcap_layout(mm)
+        end = min(end, len(mm))
+        off = start
+        while off + PCAP_REC_LEN <= end:
+            sec, frac, incl, _ = rec.unpack_from(mm, off)
+            off += PCAP_REC_LEN
+            _dpkt_record(add, link, sec + frac / divisor, mm[off:off + incl])
+            off += incl
+    return results
+
+
+def reconstruct_parallel(pcap_path: str, categories: list = None,
+                         nparts: int = None) -> dict:
+    """
+    reconstruct_dpkt() split across a multiprocessing Pool, one worker per
+    byte range of the file. Per-range results are merged in file order, so
+    the output matches the sequential parse. Small files, pcapng and hosts
+    without dpkt take the sequential path.
+    """
+    if not DPKT:
+        return reconstruct_scapy(pcap_path, categories)
+
+    nparts = nparts or os.cpu_count() or 1
+    try:
+        with open(pcap_path, "rb") as f:
+            if nparts < 2 or os.fstat(f.fileno()).st_size < PARALLEL_MIN_BYTES:
+                raise ValueError("sequential")
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                ranges = _pcap_record_offsets(mm, nparts)
+    except (OSError, ValueError, struct.error):
+        return reconstruct_dpkt(pcap_path, categories)
+    if len(ranges) < 2:
+        return reconstruct_dpkt(pcap_path, categories)
+
+    with Pool(len(ranges)) as pool:
+        parts = pool.map(reconstruct_range, [(pcap_path, s, e) for s, e in ranges])
+
+    merged = defaultdict(MessageList)
+    for part in parts:
+        for platform, msgs in part.items():
+            merged[platform].extend(msgs)
+    return dict(merged)
@@ -1,19 +1,21 @@
 """Report Flow UI - generate reports from captured data."""
 
-import os, glob, json
+import os
 from rich.prompt  import Prompt, Confirm
 from rich.panel   import Panel
 from rich.table   import Table
 from rich         import box
 
+from ui.keys import wait_key
+
 
 class ReportFlow:
     def __init__(self, console):
         self.console = console
 
     def _pick_file(self, ext, label):
-        default_dir = os.path.expanduser("~/netcapture_output")
-        files = sorted(glob.glob(f"{default_dir}/**/*{ext}", recursive=True), reverse=True)[:10]
+        from core.outputs import scan_outputs
+        files = [p for p, _, _ in scan_outputs(ext=ext, limit=10)]
         c = self.console
         if files:
             c.print(f"\n  [bold cyan]Recent {label} files:[/bold cyan]")
@@ -39,22 +41,22 @@ class ReportFlow:
         pcap = self._pick_file(".pcap", ".pcap")
         if not pcap or not os.path.exists(pcap):
             c.print(f"[red]  File not found: {pcap}[/red]")
-            input("  Press Enter..."); return
+            wait_key("  Press any key..."); return
 
         # Pick meta
         meta = {}
         meta_path = pcap.replace(".pcap", "_meta.json")
         if os.path.exists(meta_path):
-            with open(meta_path) as f:
-                meta = json.load(f)
+            from core.jsonio import load_json
+            meta = load_json(meta_path)
             c.print(f"  [green]✓[/green] Loaded metadata from [cyan]{meta_path}[/cyan]")
         else:
             c.print("  [yellow]⚠  No metadata file found. Report will have limited info.[/yellow]")
 
         # Reconstruct messages
         with c.status("[magenta]  Reconstructing messages from pcap...[/magenta]", spinner="aesthetic"):
-            from core.reconstructor import reconstruct
-            messages = reconstruct(pcap)
+            from core.reconstructor import reconstruct_parallel
+            messages = reconstruct_parallel(pcap)
 
         total_msgs = sum(len(v) for v in messages.values())
         c.print(f"  [green]✓[/green] Found [bold]{total_msgs}[/bold] items across [bold]{len(messages)}[/bold] platforms\n")
@@ -67,23 +69,20 @@ class ReportFlow:
 
         # Generate HTML
         html_path = os.path.join(out_dir, f"{base}_report.html")
-        from core.reporter import generate_html, generate_txt
-        generate_html(html_path, meta, messages)
+        from core.reporter import generate_html, generate_txt, now_str
+        generated = now_str()
+        generate_html(html_path, meta, messages, generated)
         c.print(f"  [green]✓[/green] HTML report → [cyan]{html_path}[/cyan]")
 
         # Generate TXT
         txt_path = os.path.join(out_dir, f"{base}_report.txt")
-        generate_txt(txt_path, meta, messages)
+        generate_txt(txt_path, meta, messages, generated)
         c.print(f"  [green]✓[/green] Text report → [cyan]{txt_path}[/cyan]")
 
         # Save messages JSON
+        from core.jsonio import dump_json_stream
         msg_path = os.path.join(out_dir, f"{base}_messages.json")
-        serializable = {
-            k: [{kk: list(vv) if isinstance(vv, set) else vv for kk, vv in m.items()} for m in v]
-            for k, v in messages.items()
-        }
-        with open(msg_path, "w") as f:
-            json.dump(serializable, f, indent=2, default=str)
+        dump_json_stream(msg_path, messages)
         c.print(f"  [green]✓[/green] Messages JSON → [cyan]{msg_path}[/cyan]")
 
         # Summary table
@@ -103,5 +102,5 @@ class ReportFlow:
         c.print(f"\n  [bold green]Open the HTML report in a browser for the full visual report.[/bold green]")
         c.print(f"  [dim]xdg-open {html_path}[/dim]")
 
-        c.print("\n  [dim]Press Enter to return to menu...[/dim]")
-        input()
+        c.print("\n  [dim]Press any key to return to menu...[/dim]")
+        wait_key()
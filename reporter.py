@@ -3,8 +3,13 @@ Report Generator
 Produces a rich HTML report and a plain-text report from reconstructed messages + metadata.
 """
 
-import os, json
-from datetime import datetime
+import os, re, json, heapq
+from contextlib import contextmanager
+from datetime   import datetime
+from functools  import lru_cache
+from itertools  import islice
+from operator   import itemgetter
+from string     import Formatter
 
 
 # ── HTML Report ─────────────────────────────────────────
@@ -234,37 +239,147 @@ HTML_TEMPLATE = """<!DOCTYPE html>
 </body>
 </html>"""
 
-
+# Parsed once at import: (literal, field) pairs with {{ }} already unescaped,
+# so a render writes the pieces out instead of str.format re-scanning ~6 KB.
+_HTML_PARTS = [(lit, field) for lit, field, _spec, _conv in Formatter().parse(HTML_TEMPLATE)]
+
+
+def _generate(parts, ctx):
+    """Yield the rendered template lazily; a ctx value is a str or an iterable of chunks."""
+    for lit, field in parts:
+        yield lit
+        if field:
+            value = ctx[field]
+            if isinstance(value, str):
+                yield value
+            else:
+                yield from value
+
+
+def _bake(parts, fixed):
+    """Fold constant field values from `fixed` into the neighbouring literals."""
+    out, lit_acc = [], ""
+    for lit, field in parts:
+        lit_acc += lit
+        if field in fixed:
+            lit_acc += fixed[field]
+        else:
+            out.append((lit_acc, field))
+            lit_acc = ""
+    return out
+
+
+def _joined(frags, sep, empty):
+    """Yield `frags` with `sep` between them, or just `empty` if there are none."""
+    first = True
+    for frag in frags:
+        if not first:
+            yield sep
+        yield frag
+        first = False
+    if first:
+        yield empty
+
+
+# Captured values go through one C-level translate; covers text and the
+# double-quoted attributes the template uses.
+_HTML_ENTITIES = {"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;"}
+_HTML_ESCAPE   = str.maketrans(_HTML_ENTITIES)
+
+# Message bodies: escape and squeeze whitespace runs (padding, blank-line
+# stacks) in one regex pass; a run containing a newline keeps one newline.
+_MSG_RX = re.compile(r'[&<>"]|\s{2,}')
+
+
+def _e(s) -> str:
+    """HTML-escape an untrusted value (non-strings are str()'d first)."""
+    return str(s).translate(_HTML_ESCAPE)
+
+
+def _msg_sub(m):
+    s = m.group()
+    return _HTML_ENTITIES.get(s) or ("\n" if "\n" in s else " ")
+
+
+def _e_msg(s: str) -> str:
+    """_e() for message content, also collapsing whitespace runs."""
+    return _MSG_RX.sub(_msg_sub, s)
+
+
+@contextmanager
+def _atomic_open(output_path):
+    """
+    Text handle on `output_path + ".tmp"`, renamed over `output_path` on
+    success so a failed render never leaves a half-written report. The
+    directory is only created when the first open finds it missing.
+    """
+    tmp = output_path + ".tmp"
+    try:
+        f = open(tmp, "w", encoding="utf-8", buffering=1 << 20)
+    except FileNotFoundError:
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        f = open(tmp, "w", encoding="utf-8", buffering=1 << 20)
+    try:
+        with f:
+            yield f
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    os.replace(tmp, output_path)
+
+
+def now_str() -> str:
+    """Report timestamp; pass one value to both generators to keep them in step."""
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+# (upper bound, divisor, suffix) bands, smallest first
+_UNITS = ((1024, 1, "B"), (1024**2, 1024, "KB"), (float("inf"), 1024**2, "MB"))
+
+
+@lru_cache(maxsize=4096)
 def _format_bytes(b):
-    if b < 1024: return f"{b} B"
-    if b < 1024**2: return f"{b/1024:.1f} KB"
-    return f"{b/1024**2:.1f} MB"
+    for limit, div, unit in _UNITS:
+        if b < limit:
+            return f"{b} B" if div == 1 else f"{b/div:.1f} {unit}"
 
 
-def _device_card(ip, dev):
-    ports = ", ".join(str(p) for p in sorted(dev.get("open_ports",[]))[:8])
-    hosts = ", ".join(list(dev.get("hostnames",[]))[:3])
-    return f"""
+_ROW_TMPL    = '<div class="row"><span class="label">{}</span><span class="value">{}</span></div>'
+_DEVICE_TMPL = """
 <div class="device-card">
   <div class="ip">{ip}</div>
-  <div class="row"><span class="label">MAC</span><span class="value">{dev.get('mac','—')}</span></div>
-  <div class="row"><span class="label">Vendor</span><span class="value">{dev.get('vendor','Unknown')}</span></div>
-  <div class="row"><span class="label">TTL</span><span class="value">{dev.get('ttl','—')}</span></div>
-  {'<div class="row"><span class="label">Hostnames</span><span class="value">' + hosts + '</span></div>' if hosts else ''}
-  {'<div class="row"><span class="label">Active Ports</span><span class="value">' + ports + '</span></div>' if ports else ''}
-  <div class="os-pill">🖥 {dev.get('os_guess','Unknown')}</div>
+  <div class="row"><span class="label">MAC</span><span class="value">{mac}</span></div>
+  <div class="row"><span class="label">Vendor</span><span class="value">{vendor}</span></div>
+  <div class="row"><span class="label">TTL</span><span class="value">{ttl}</span></div>
+  {hosts_row}
+  {ports_row}
+  <div class="os-pill">🖥 {os_guess}</div>
 </div>"""
 
 
+def _device_card(ip, dev):
+    ports = ", ".join(map(str, heapq.nsmallest(8, dev.get("open_ports", ()))))
+    hosts = _e(", ".join(dev.get("hostnames",[])[:3]))
+    return _DEVICE_TMPL.format(
+        ip=_e(ip),
+        mac=_e(dev.get("mac", "—")),
+        vendor=_e(dev.get("vendor", "Unknown")),
+        ttl=_e(dev.get("ttl", "—")),
+        hosts_row=_ROW_TMPL.format("Hostnames", hosts) if hosts else "",
+        ports_row=_ROW_TMPL.format("Active Ports", ports) if ports else "",
+        os_guess=_e(dev.get("os_guess", "Unknown")),
+    )
+
+
 def _traffic_row(cat, info, max_count):
     bar_pct = int(info['count'] / max(max_count, 1) * 100)
-    domains  = ", ".join(list(info.get('domains',[]))[:4])
+    domains  = ", ".join(info.get('domains',[])[:4])
     return f"""  <tr>
-    <td style="color:#00e5ff;font-weight:700">{cat}</td>
+    <td style="color:#00e5ff;font-weight:700">{_e(cat)}</td>
     <td>{info['count']:,}</td>
     <td>{_format_bytes(info['bytes'])}</td>
     <td><div class="bar-wrap"><div class="bar" style="width:{bar_pct}%"></div></div></td>
-    <td style="color:#4a6080;font-size:11px">{domains[:80]}</td>
+    <td style="color:#4a6080;font-size:11px">{_e(domains[:80])}</td>
   </tr>"""
 
 
@@ -280,27 +395,51 @@ PLATFORM_ICONS = {
 }
 
 
-def _message_section(platform, messages):
-    icon = PLATFORM_ICONS.get(platform, "📨")
-    bubbles = ""
-    for msg in messages[:100]:
-        content = msg.get("content","") or msg.get("query","") or msg.get("event","") or str(msg)
-        sender  = msg.get("sender","") or msg.get("from","") or msg.get("src","")
-        ts      = msg.get("timestamp","")
-        direction = msg.get("direction","recv")
-        cls = "sent" if direction == "sent" else ("event" if "event" in msg or "query" in msg else "recv")
+# First non-empty field wins, in this order
+_FIRST  = ("content", "query", "event")
+_SENDER = ("sender", "from", "src")
 
-        sender_html = f'<div class="msg-from">From: {sender}</div>' if sender else ""
-        bubbles += f"""
-<div class="message-bubble {cls}">
+
+def _first(msg, keys=_FIRST):
+    """First truthy msg[k] for k in `keys`, else ''."""
+    get = msg.get
+    for k in keys:
+        v = get(k)
+        if v:
+            return v
+    return ""
+
+
+# Two-stage template: the section fills the platform label (the single
+# {} below), leaving a per-platform format string for cls, ts, sender, content.
+_BUBBLE_TMPL = """
+<div class="message-bubble {{}}">
   <div class="msg-header">
-    <span class="msg-platform">{icon} {platform}</span>
-    <span class="msg-time">{ts}</span>
+    <span class="msg-platform">{}</span>
+    <span class="msg-time">{{}}</span>
   </div>
-  {sender_html}
-  <div class="msg-content">{content[:400]}</div>
+  {{}}
+  <div class="msg-content">{{}}</div>
 </div>"""
 
+
+def _message_section(platform, messages):
+    icon = PLATFORM_ICONS.get(platform, "📨")
+    platform = _e(platform)
+    label  = f"{icon} {platform}".replace("{", "{{").replace("}", "}}")
+    bubble = _BUBBLE_TMPL.format(label).format
+    parts, shown = [], messages[:100]
+    append, first = parts.append, _first
+    for msg in shown:
+        content = first(msg) or str(msg)
+        sender  = first(msg, _SENDER)
+        ts      = msg.get("timestamp","")
+        cls = "sent" if msg.get("direction") == "sent" else ("event" if "event" in msg or "query" in msg else "recv")
+
+        sender_html = f'<div class="msg-from">From: {_e(sender)}</div>' if sender else ""
+        append(bubble(cls, _e(ts), sender_html, _e_msg(str(content)[:400])))
+    bubbles = "".join(parts)
+
     overflow = f'<p style="color:#4a6080;margin:8px 0">... and {len(messages)-100} more items (see JSON for full data)</p>' if len(messages) > 100 else ""
 
     return f"""
@@ -311,94 +450,156 @@ def _message_section(platform, messages):
 </div>"""
 
 
-def generate_html(output_path: str, meta: dict, messages: dict) -> str:
-    devices      = meta.get("devices", {})
-    traffic_sum  = meta.get("traffic_summary", {})
-    target_ip    = meta.get("target_ip", "Unknown")
-    total_packets = meta.get("total_packets", 0)
-    generated    = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+# Traffic categories listed per report (the engine produces well under this)
+TOP_TRAFFIC = 50
+
 
-    device_cards = "\n".join(_device_card(ip, d) for ip, d in devices.items()) or "<p style='color:#4a6080'>No device data collected.</p>"
+def _by_count(traffic_sum):
+    """Top TOP_TRAFFIC (category, info) pairs, busiest first; ties keep capture order."""
+    items = [(cat, info, info["count"]) for cat, info in traffic_sum.items()]
+    return [(cat, info) for cat, info, _ in heapq.nlargest(TOP_TRAFFIC, items, key=itemgetter(2))]
 
+
+# Largest hostname / domain count any report line shows (TXT hosts/domains)
+TRIM_NAMES = 5
+
+
+def _prepare_meta(meta: dict) -> dict:
+    """
+    Shallow copy of `meta` with every hostnames / domains collection cut to
+    a TRIM_NAMES-item list, so large sets are walked once (and only that
+    far) instead of list()-ed per render. Order is kept; `meta` is untouched.
+    """
+    def trim(d: dict, key: str) -> dict:
+        return {**d, key: list(islice(d.get(key) or (), TRIM_NAMES))}
+
+    return {
+        **meta,
+        "devices":         {ip: trim(dev, "hostnames") for ip, dev in meta.get("devices", {}).items()},
+        "traffic_summary": {cat: trim(info, "domains") for cat, info in meta.get("traffic_summary", {}).items()},
+    }
+
+
+def _is_empty(meta: dict, messages: dict) -> bool:
+    """Nothing to render beyond the header (typically a failed capture)."""
+    return not (meta.get("devices") or meta.get("traffic_summary") or any(messages.values()))
+
+
+# ── Empty-state fragments and the pre-rendered empty reports ────
+
+_NO_DEVICES  = "<p style='color:#4a6080'>No device data collected.</p>"
+_NO_TRAFFIC  = "  <tr><td colspan='5' style='color:#4a6080;padding:20px'>No traffic data.</td></tr>"
+_NO_MESSAGES = "<p style='color:#4a6080'>No messages reconstructed. Capture may be encrypted — use the Decrypt module.</p>"
+
+# Only target_ip, generated and total_packets are left as fields
+_EMPTY_HTML_PARTS = _bake(_HTML_PARTS, dict(
+    capture_count="0",
+    device_cards=_NO_DEVICES,
+    traffic_rows=_NO_TRAFFIC,
+    message_sections=_NO_MESSAGES,
+))
+
+_TXT_HEAD = ("=" * 70 + "\n  NetCapture Pro — Human Readable Traffic Report"
+             "\n  Target IP  : {}\n  Generated  : {}\n  Total Pkts : {:,}\n" + "=" * 70)
+_TXT_EMPTY_BODY = "\n\n── DEVICE INFORMATION ──\n\n── TRAFFIC SUMMARY ──\n\n── RECONSTRUCTED MESSAGES ──\n"
+
+
+# ── Section renderers: one generator per template loop ──
+
+def _device_cards(devices):
+    for ip, d in devices.items():
+        yield _device_card(ip, d)
+
+
+def _traffic_rows(traffic_sum):
     max_count = max((v["count"] for v in traffic_sum.values()), default=1)
-    traffic_rows = "\n".join(
-        _traffic_row(cat, info, max_count)
-        for cat, info in sorted(traffic_sum.items(), key=lambda x: -x[1]["count"])
-    ) or "  <tr><td colspan='5' style='color:#4a6080;padding:20px'>No traffic data.</td></tr>"
+    for cat, info in _by_count(traffic_sum):
+        yield _traffic_row(cat, info, max_count)
+
 
-    # Messages (exclude DNS if huge)
-    msg_sections_html = ""
+def _message_sections(messages):
     for platform, msgs in messages.items():
-        if not msgs:
-            continue
-        msg_sections_html += _message_section(platform, msgs)
-    if not msg_sections_html:
-        msg_sections_html = "<p style='color:#4a6080'>No messages reconstructed. Capture may be encrypted — use the Decrypt module.</p>"
-
-    html = HTML_TEMPLATE.format(
-        target_ip=target_ip,
-        generated=generated,
-        total_packets=f"{total_packets:,}",
-        capture_count=len(traffic_sum),
-        device_cards=device_cards,
-        traffic_rows=traffic_rows,
-        message_sections=msg_sections_html,
+        if msgs:
+            yield _message_section(platform, msgs)
+
+
+def generate_html(output_path: str, meta: dict, messages: dict, generated: str = None) -> str:
+    ctx = dict(
+        target_ip=_e(meta.get("target_ip", "Unknown")),
+        generated=generated or now_str(),
+        total_packets=f"{meta.get('total_packets', 0):,}",
     )
 
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(html)
+    if _is_empty(meta, messages):
+        parts = _EMPTY_HTML_PARTS
+    else:
+        # Sections are generators, streamed fragment by fragment into the file
+        meta        = _prepare_meta(meta)
+        devices     = meta["devices"]
+        traffic_sum = meta["traffic_summary"]
+        parts       = _HTML_PARTS
+        ctx.update(
+            capture_count=str(len(traffic_sum)),
+            device_cards=_joined(_device_cards(devices), "\n", _NO_DEVICES),
+            traffic_rows=_joined(_traffic_rows(traffic_sum), "\n", _NO_TRAFFIC),
+            message_sections=_joined(_message_sections(messages), "", _NO_MESSAGES),
+        )
+
+    with _atomic_open(output_path) as f:
+        f.writelines(_generate(parts, ctx))
     return output_path
 
 
-def generate_txt(output_path: str, meta: dict, messages: dict) -> str:
-    lines = []
-    lines.append("=" * 70)
-    lines.append("  NetCapture Pro — Human Readable Traffic Report")
-    lines.append(f"  Target IP  : {meta.get('target_ip','?')}")
-    lines.append(f"  Generated  : {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    lines.append(f"  Total Pkts : {meta.get('total_packets',0):,}")
-    lines.append("=" * 70)
-
-    # Devices
-    lines.append("\n── DEVICE INFORMATION ──\n")
-    for ip, dev in meta.get("devices",{}).items():
-        lines.append(f"  IP       : {ip}")
-        lines.append(f"  MAC      : {dev.get('mac','—')}")
-        lines.append(f"  Vendor   : {dev.get('vendor','Unknown')}")
-        lines.append(f"  OS Guess : {dev.get('os_guess','Unknown')} (TTL={dev.get('ttl','?')})")
-        lines.append(f"  Ports    : {', '.join(str(p) for p in sorted(dev.get('open_ports',[]))[:10])}")
-        lines.append(f"  Hosts    : {', '.join(list(dev.get('hostnames',[]))[:5])}")
-        lines.append("")
-
-    # Traffic
-    lines.append("── TRAFFIC SUMMARY ──\n")
-    for cat, info in sorted(meta.get("traffic_summary",{}).items(), key=lambda x: -x[1]["count"]):
-        lines.append(f"  [{cat}]")
-        lines.append(f"    Packets : {info['count']:,}  |  Bytes: {_format_bytes(info['bytes'])}")
-        if info.get("domains"):
-            lines.append(f"    Domains : {', '.join(list(info['domains'])[:5])}")
-        lines.append("")
-
-    # Messages
-    lines.append("── RECONSTRUCTED MESSAGES ──\n")
-    for platform, msgs in messages.items():
-        if not msgs:
-            continue
-        lines.append(f"  ▶ {platform} ({len(msgs)} items)")
-        lines.append("  " + "─" * 50)
-        for msg in msgs[:50]:
-            ts      = msg.get("timestamp","")
-            sender  = msg.get("sender","") or msg.get("from","") or msg.get("src","")
-            content = msg.get("content","") or msg.get("query","") or msg.get("event","") or ""
-            if ts:     lines.append(f"  Time    : {ts}")
-            if sender: lines.append(f"  From    : {sender}")
-            if content:lines.append(f"  Content : {content[:300]}")
-            lines.append("")
-        if len(msgs) > 50:
-            lines.append(f"  ... and {len(msgs)-50} more items\n")
-
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write("\n".join(lines))
+def generate_txt(output_path: str, meta: dict, messages: dict, generated: str = None) -> str:
+    head = _TXT_HEAD.format(meta.get("target_ip", "?"), generated or now_str(), meta.get("total_packets", 0))
+    if _is_empty(meta, messages):
+        with _atomic_open(output_path) as f:
+            f.write(head + _TXT_EMPTY_BODY)
+        return output_path
+
+    meta = _prepare_meta(meta)
+    # Streamed straight into a 1 MB buffer; every line after the first is
+    # written as "\n" + line, so the file matches the old "\n".join(lines).
+    with _atomic_open(output_path) as f:
+        w = f.write
+        w(head)
+
+        # Devices
+        w("\n\n── DEVICE INFORMATION ──\n")
+        for ip, dev in meta.get("devices",{}).items():
+            w(f"\n  IP       : {ip}")
+            w(f"\n  MAC      : {dev.get('mac','—')}")
+            w(f"\n  Vendor   : {dev.get('vendor','Unknown')}")
+            w(f"\n  OS Guess : {dev.get('os_guess','Unknown')} (TTL={dev.get('ttl','?')})")
+            w(f"\n  Ports    : {', '.join(map(str, heapq.nsmallest(10, dev.get('open_ports', ()))))}")
+            w(f"\n  Hosts    : {', '.join(dev.get('hostnames',[])[:5])}")
+            w("\n")
+
+        # Traffic
+        w("\n── TRAFFIC SUMMARY ──\n")
+        for cat, info in _by_count(meta.get("traffic_summary",{})):
+            w(f"\n  [{cat}]")
+            w(f"\n    Packets : {info['count']:,}  |  Bytes: {_format_bytes(info['bytes'])}")
+            if info.get("domains"):
+                w(f"\n    Domains : {', '.join(info['domains'][:5])}")
+            w("\n")
+
+        # Messages
+        w("\n── RECONSTRUCTED MESSAGES ──\n")
+        first = _first
+        for platform, msgs in messages.items():
+            if not msgs:
+                continue
+            w(f"\n  ▶ {platform} ({len(msgs)} items)")
+            w("\n  " + "─" * 50)
+            for msg in msgs[:50]:
+                ts      = msg.get("timestamp","")
+                sender  = first(msg, _SENDER)
+                content = first(msg)
+                if ts:     w(f"\n  Time    : {ts}")
+                if sender: w(f"\n  From    : {sender}")
+                if content:w(f"\n  Content : {str(content)[:300]}")
+                w("\n")
+            if len(msgs) > 50:
+                w(f"\n  ... and {len(msgs)-50} more items\n")
     return output_path